@@ -0,0 +1,151 @@
+"""
+Offline benchmarks of canvas_utils against a local fake Canvas server.
+
+    python benchmarks/bench_canvas.py                       # all workloads
+    python benchmarks/bench_canvas.py quiz_bulk roster --latency 0.05 --json results.json
+
+For every workload the wall time, the no of requests per endpoint and the throughput are reported.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from canvas_utils import Canvas                      # noqa: E402
+from canvas_utils.image_cache import ImageCache      # noqa: E402
+from fake_canvas import FakeCanvas                   # noqa: E402
+
+
+def _quiz(canvas, server, args):
+    course = canvas.get_course(server.add_course('Quiz benchmark'))
+    quiz = course.create_quiz('Benchmark')
+    quiz.image_cache = None
+    return course, quiz
+
+
+def quiz_serial(canvas, server, args):
+    """<n> questions, one blocking POST after the other"""
+    course, quiz = _quiz(canvas, server, args)
+    quiz.new_quiz_group('Group', pick_count=10, points=1)
+    for i in range(args.questions):
+        quiz.new_mc_question('Q%d' % i, 'What is $%d+1$?' % i, str(i + 1), [str(i), str(i + 2)], grouped=i % 2 == 0)
+    return args.questions
+
+
+def quiz_bulk(canvas, server, args):
+    """<n> questions through CanvasQuiz.bulk_add_questions"""
+    course, quiz = _quiz(canvas, server, args)
+    specs = [dict(type='group', name='Group', pick_count=10, points=1)]
+    specs += [dict(type='mc', title='Q%d' % i, text='What is $%d+1$?' % i, correct=str(i + 1),
+                   wrong=[str(i), str(i + 2)], grouped=i % 2 == 0) for i in range(args.questions)]
+    failures = quiz.bulk_add_questions(specs, max_workers=args.workers)
+    if failures:
+        print('  %d failures, first: %r' % (len(failures), failures[0][2]))
+    return args.questions
+
+
+def quiz_images(canvas, server, args):
+    """100 questions sharing 5 images, with image cache"""
+    course, quiz = _quiz(canvas, server, args)
+    with tempfile.TemporaryDirectory() as tmp:
+        quiz.image_cache = ImageCache(os.path.join(tmp, 'cache.json'))
+        images = []
+        for k in range(5):
+            name = os.path.join(tmp, 'figure%d.png' % k)
+            with open(name, 'wb') as f:
+                f.write(os.urandom(50000))
+            images.append(name)
+        specs = [dict(type='essay', title='Q%d' % i, text='Explain %IMAGE%', image=images[i % 5])
+                 for i in range(100)]
+        quiz.bulk_add_questions(specs, max_workers=args.workers)
+    return 100
+
+
+def delete(canvas, server, args):
+    """delete <n> quizzes, files, modules and folders"""
+    course_id = server.add_course('Delete benchmark')
+    n = args.questions // 4
+    for kind in ('quizzes', 'files', 'modules', 'folders'):
+        server.add_objects(course_id, kind, n)
+    course = canvas.get_course(course_id)
+    deleted = 0
+    for method in (course.delete_all_quizzes, course.delete_all_files, course.delete_all_modules,
+                   course.delete_folders):
+        summary = method(max_workers=args.workers)
+        deleted += summary.count
+        if summary.failed:
+            print('  %s: %s' % (method.__name__, summary))
+    return deleted
+
+
+def roster(canvas, server, args):
+    """export <students> users as csv"""
+    course = canvas.get_course(server.add_course('Roster benchmark', n_students=args.students))
+    return course.export_users(io.StringIO())
+
+
+WORKLOADS = dict(quiz_serial=quiz_serial, quiz_bulk=quiz_bulk, quiz_images=quiz_images, delete=delete,
+                 roster=roster)
+
+
+def run(names, args):
+    server = FakeCanvas(latency=args.latency, rate_limit=args.rate_limit, refill=args.refill).start()
+    results = []
+    try:
+        canvas = Canvas(server.url, 'benchmark-token', instrument=args.instrument)
+        for name in names:
+            server.reset_counts()
+            start = time.perf_counter()
+            n = WORKLOADS[name](canvas, server, args)
+            wall = time.perf_counter() - start
+            requests = sum(server.counts.values())
+            result = dict(workload=name, wall=wall, items=n, requests=requests,
+                          items_per_s=n / wall if wall else 0.0, requests_per_s=requests / wall if wall else 0.0,
+                          bytes_in=server.bytes_in, bytes_out=server.bytes_out, endpoints=dict(server.counts))
+            results.append(result)
+            print('%-12s %8.3f s  %6d items  %6d requests  %8.1f items/s  %8.1f req/s' % (
+                name, wall, n, requests, result['items_per_s'], result['requests_per_s']))
+            if args.verbose:
+                for endpoint, count in sorted(server.counts.items(), key=lambda x: -x[1]):
+                    print('    %6d  %s' % (count, endpoint))
+            if args.instrument:
+                print(canvas.instrumentation.report())
+                canvas.instrumentation.reset()
+    finally:
+        server.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('workloads', nargs='*', help='workloads to run: %s (default: all)' % ', '.join(WORKLOADS))
+    parser.add_argument('--latency', type=float, default=0.02, help='latency per request in s')
+    parser.add_argument('--rate-limit', type=float, default=700.0, help='size of the rate limit bucket')
+    parser.add_argument('--refill', type=float, default=100.0, help='rate limit refill per s')
+    parser.add_argument('--questions', type=int, default=500, help='no of questions / deleted objects')
+    parser.add_argument('--students', type=int, default=5000, help='no of students for the roster export')
+    parser.add_argument('--workers', type=int, default=8, help='max. no of concurrent requests')
+    parser.add_argument('--instrument', action='store_true', help='client side request statistics per workload')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the requests per endpoint')
+    args = parser.parse_args(argv)
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error('unknown workloads: %s' % ', '.join(sorted(unknown)))
+
+    warnings.filterwarnings('ignore', message='Canvas may respond unexpectedly')
+    results = run(args.workloads or list(WORKLOADS), args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(args=vars(args), results=results), f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
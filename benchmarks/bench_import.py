@@ -0,0 +1,94 @@
+"""
+Cold start benchmark: import time of canvas_utils and start time of the canvasctl command line.
+
+    python benchmarks/bench_import.py                  # all cases, 10 runs each
+    python benchmarks/bench_import.py latex cli_help --runs 20 --json results.json
+
+Every run is a fresh interpreter. Besides the time the benchmark checks which heavy modules each
+case pulls in; with --check it exits with status 1 if a case imports a module it should not need
+(e.g. canvasapi for `from canvas_utils import LaTeX2HTML`).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ('canvasapi', 'requests', 'numpy', 'sqlite3')
+
+# name -> (code, modules the case must not import)
+CASES = dict(
+    baseline=('pass', HEAVY),
+    package=('import canvas_utils', HEAVY),
+    latex=('from canvas_utils import LaTeX2HTML', HEAVY),
+    canvas=('from canvas_utils import Canvas', ('numpy',)),
+    classes=('from canvas_utils import Canvas, CanvasCourse, CanvasQuiz', ('numpy',)),
+    cli_help=('import sys, contextlib, io\n'
+              'from canvas_utils import cli\n'
+              'with contextlib.redirect_stdout(io.StringIO()):\n'
+              '    try:\n'
+              '        cli.main(["--help"])\n'
+              '    except SystemExit:\n'
+              '        pass', HEAVY),
+)
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+exec(compile(%r, '<case>', 'exec'))
+elapsed = time.perf_counter() - start
+print(repr((elapsed, sorted(m for m in %r if m in sys.modules))))
+'''
+
+
+def run_case(code, heavy):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    out = subprocess.run([sys.executable, '-c', PROBE % (code, heavy)], env=env, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return eval(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cases', nargs='*', help='cases to run: %s (default: all)' % ', '.join(CASES))
+    parser.add_argument('--runs', type=int, default=10, help='no of fresh interpreters per case')
+    parser.add_argument('--check', action='store_true', help='fail if a case imports modules it should not need')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error('unknown cases: %s' % ', '.join(sorted(unknown)))
+
+    results = []
+    problems = []
+    for name in args.cases or list(CASES):
+        code, forbidden = CASES[name]
+        times = []
+        loaded = set()
+        for _ in range(args.runs):
+            elapsed, modules = run_case(code, HEAVY)
+            times.append(elapsed)
+            loaded.update(modules)
+        unexpected = sorted(loaded & set(forbidden))
+        if unexpected:
+            problems.append('%s imports %s' % (name, ', '.join(unexpected)))
+        result = dict(case=name, median=statistics.median(times), min=min(times), max=max(times),
+                      runs=args.runs, imports=sorted(loaded))
+        results.append(result)
+        print('%-10s %8.1f ms median  %8.1f ms min  imports: %s' % (
+            name, 1000 * result['median'], 1000 * result['min'], ', '.join(result['imports']) or '-'))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(args=vars(args), results=results), f, indent=1)
+    for p in problems:
+        print('*** ' + p)
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
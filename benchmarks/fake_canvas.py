@@ -0,0 +1,467 @@
+"""
+Local stand-in for the parts of the Canvas REST API used by canvas_utils. It keeps everything in
+memory, paginates with Link headers and sends X-Rate-Limit-Remaining headers.
+
+    server = FakeCanvas(latency=0.02).start()
+    canvas = Canvas(server.url, 'token')
+    ...
+    print(server.counts)
+    server.stop()
+"""
+import collections
+import email.parser
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+def unflatten(pairs):
+    """
+    Turns rails style form fields (question[answers][][text]=...) into nested dicts and lists
+    """
+    out = {}
+    for key, value in pairs:
+        head = key.split('[', 1)[0]
+        path = [head] + ['#' if t == '' else t for t in re.findall(r'\[([^\]]*)\]', key)]
+        _insert(out, path, value)
+    return out
+
+
+def _insert(node, path, value):
+    key, rest = path[0], path[1:]
+    if not rest:
+        node[key] = value
+    elif rest[0] == '#':
+        items = node.setdefault(key, [])
+        if len(rest) == 1:
+            items.append(value)
+            return
+        sub = rest[1]
+        if not items or sub in items[-1] and len(rest) == 2:
+            items.append({})
+        _insert(items[-1], rest[1:], value)
+    else:
+        _insert(node.setdefault(key, {}), rest, value)
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _settings(data):
+    # form fields arrive as strings; canvas answers with real booleans
+    return {k: {'true': True, 'false': False}.get(v.lower(), v) if isinstance(v, str) else v
+            for k, v in data.items()}
+
+
+class FakeCanvas(object):
+    """
+    :param latency:    delay of every request in seconds
+    :param rate_limit: size of the rate limit bucket (X-Rate-Limit-Remaining)
+    :param refill:     units per second refilled into the bucket
+    :param cost:       units each request takes from the bucket; requests on an empty bucket get 403
+    """
+    def __init__(self, latency=0.0, rate_limit=700.0, refill=10.0, cost=1.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.refill = refill
+        self.cost = cost
+        self.bucket = rate_limit
+        self.stamp = time.monotonic()
+        self.ids = itertools.count(1000)
+        self.lock = threading.RLock()
+        self.counts = collections.Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.courses = {}
+        self.contents = {}
+        self.reset_counts()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    # ---- setup
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def new_id(self):
+        return next(self.ids)
+
+    def add_course(self, name='Course', n_students=0, course_id=None, sis_course_id=None):
+        with self.lock:
+            course_id = course_id or self.new_id()
+            root = dict(id=self.new_id(), name='course files', full_name='course files', parent_folder_id=None)
+            course = dict(
+                attrs=dict(id=course_id, name=name, course_code=name, sis_course_id=sis_course_id,
+                           workflow_state='available'),
+                quizzes={}, questions={}, groups={}, files={}, folders={root['id']: root}, modules={}, items={},
+                users={}, enrollments={}, submissions={})
+            for i in range(n_students):
+                user_id = self.new_id()
+                user = dict(id=user_id, name='Student %d' % i, sortable_name='Student, %05d' % i,
+                            login_id='s%05d' % i, created_at='2024-01-01T00:00:00Z')
+                course['users'][user_id] = user
+                course['enrollments'][self.new_id()] = dict(
+                    id=0, user_id=user_id, type='StudentEnrollment', enrollment_state='active',
+                    created_at='2024-01-01T00:00:00Z', user=dict(id=user_id, sortable_name=user['sortable_name'],
+                                                                 login_id=user['login_id']))
+            for eid, e in course['enrollments'].items():
+                e['id'] = eid
+            self.courses[course_id] = course
+            return course_id
+
+    def add_objects(self, course_id, kind, n, **attrs):
+        """
+        Adds n objects of a kind ('quizzes', 'files', 'folders', 'modules') to a course
+
+        :return: list of ids
+        """
+        with self.lock:
+            course = self.courses[course_id]
+            root = [f for f in course['folders'].values() if f['full_name'] == 'course files'][0]
+            ids = []
+            for i in range(n):
+                obj_id = self.new_id()
+                name = '%s %d' % (kind, obj_id)
+                obj = dict(id=obj_id, name=name, title=name, display_name=name, course_id=course_id)
+                if kind == 'folders':
+                    obj.update(full_name='course files/' + name, parent_folder_id=root['id'])
+                obj.update(attrs)
+                course[kind][obj_id] = obj
+                ids.append(obj_id)
+            return ids
+
+    # ---- request handling
+
+    def _take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.bucket = min(self.rate_limit, self.bucket + (now - self.stamp) * self.refill)
+            self.stamp = now
+            if self.bucket < self.cost:
+                return False, self.bucket
+            self.bucket -= self.cost
+            return True, self.bucket
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, data, headers=None):
+                if isinstance(data, bytes):
+                    body, ctype = data, 'application/octet-stream'
+                else:
+                    body = json.dumps(data).encode('utf-8') if data is not None else b''
+                    ctype = 'application/json; charset=utf-8'
+                self.send_response(status)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+                with fake.lock:
+                    fake.bytes_out += len(body)
+
+            def _handle(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                parts = urlsplit(self.path)
+                pairs = parse_qsl(parts.query, keep_blank_values=True)
+                ctype = self.headers.get('Content-Type', '')
+                upload = None
+                if ctype.startswith('multipart/form-data'):
+                    message = email.parser.BytesParser().parsebytes(
+                        b'Content-Type: ' + ctype.encode('latin-1') + b'\r\n\r\n' + raw)
+                    for part in message.get_payload():
+                        name = part.get_param('name', header='content-disposition')
+                        content = part.get_payload(decode=True)
+                        if part.get_filename():
+                            upload = (part.get_filename(), content)
+                        else:
+                            pairs.append((name, content.decode('utf-8')))
+                elif raw:
+                    pairs += parse_qsl(raw.decode('utf-8'), keep_blank_values=True)
+                with fake.lock:
+                    fake.bytes_in += len(raw)
+
+                if fake.latency:
+                    time.sleep(fake.latency)
+                ok, remaining = fake._take()
+                headers = {'X-Rate-Limit-Remaining': '%.1f' % remaining, 'X-Request-Cost': '%.1f' % fake.cost}
+                endpoint = re.sub(r'/\d+', '/:id', parts.path)
+                with fake.lock:
+                    fake.counts[method + ' ' + endpoint] += 1
+                if not ok:
+                    return self._send(403, {'message': '403 Forbidden (Rate Limit Exceeded)'}, headers)
+                try:
+                    status, data, extra = fake.route(method, parts.path, pairs, upload)
+                except KeyError:
+                    status, data, extra = 404, {'errors': [{'message': 'not found'}]}, {}
+                headers.update(extra)
+                self._send(status, data, headers)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PUT(self):
+                self._handle('PUT')
+
+            def do_DELETE(self):
+                self._handle('DELETE')
+
+        return Handler
+
+    def _page(self, path, pairs, items):
+        params = dict(pairs)
+        per_page = min(100, int(params.get('per_page', 10)))
+        page = int(params.get('page', 1))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            query = [(k, v) for k, v in pairs if k not in ('page', 'per_page')]
+            query += [('page', page + 1), ('per_page', per_page)]
+            headers['Link'] = '<%s%s?%s>; rel="next"' % (self.url, path, urlencode(query))
+        return 200, chunk, headers
+
+    def _create_subfolder(self, parent_id, data):
+        for course in self.courses.values():
+            if parent_id in course['folders']:
+                parent = course['folders'][parent_id]
+                folder_id = self.new_id()
+                name = data['name']
+                folder = dict(id=folder_id, name=name, full_name=parent['full_name'] + '/' + name,
+                              parent_folder_id=parent_id, context_id=course['attrs']['id'])
+                course['folders'][folder_id] = folder
+                return 200, folder, {}
+        raise KeyError(parent_id)
+
+    def _folder_path(self, course, path):
+        # like canvas, an upload creates the missing folders of its parent_folder_path
+        folders = course['folders']
+        folder = next((f for f in folders.values() if f['full_name'] == 'course files'), None)
+        for name in [n for n in path.split('/') if n]:
+            if folder is None:
+                return None
+            full_name = folder['full_name'] + '/' + name
+            found = next((f for f in folders.values() if f['full_name'] == full_name), None)
+            folder = found or self._create_subfolder(folder['id'], dict(name=name))[1]
+        return folder
+
+    def route(self, method, path, pairs, upload):
+        with self.lock:
+            return self._route(method, path, pairs, upload)
+
+    def _route(self, method, path, pairs, upload):
+        data = unflatten(pairs)
+        p = path[len('/api/v1'):] if path.startswith('/api/v1') else path
+        m = re.match(r'/courses/(sis_course_id:)?([^/]+)(/.*)?$', p)
+        if p == '/courses':
+            return self._page(path, pairs, [c['attrs'] for c in self.courses.values()])
+        if p.startswith('/upload/'):
+            course = self.courses[int(p.split('/')[2])]
+            file_id = self.new_id()
+            name, content = upload
+            folder = self._folder_path(course, data.get('parent_folder_path') or '')
+            self.contents[file_id] = content
+            course['files'][file_id] = dict(id=file_id, display_name=name, filename=name, size=len(content),
+                                            folder_id=folder['id'] if folder else None, url='%s/files/%d/download' % (self.url, file_id),
+                                            preview_url='/courses/%d/files/%d/file_preview?annotate=0' % (
+                                                course['attrs']['id'], file_id))
+            return 201, course['files'][file_id], {}
+        if m is None:
+            fm = re.match(r'/files/(\d+)/download$', p)
+            if fm is not None:
+                return 200, self.contents[int(fm.group(1))], {}
+            fm = re.match(r'/folders/(\d+)/folders$', p)
+            if fm is not None:
+                return self._create_subfolder(int(fm.group(1)), data)
+            fm = re.match(r'/(files|folders)/(\d+)$', p)
+            if fm is None:
+                raise KeyError(p)
+            kind, obj_id = fm.group(1), int(fm.group(2))
+            for course in self.courses.values():
+                if obj_id in course[kind]:
+                    if method == 'DELETE':
+                        return 200, course[kind].pop(obj_id), {}
+                    return 200, course[kind][obj_id], {}
+            raise KeyError(p)
+
+        if m.group(1):
+            course = [c for c in self.courses.values() if c['attrs']['sis_course_id'] == m.group(2)][0]
+        else:
+            course = self.courses[int(m.group(2))]
+        cid = course['attrs']['id']
+        rest = m.group(3) or ''
+        if rest == '':
+            return 200, course['attrs'], {}
+
+        def collection(kind, key=None, extra=None):
+            items = sorted(course[kind].values(), key=lambda x: (int(x.get('position') or 0), x['id']))
+            if extra:
+                items = [i for i in items if all(i.get(k) == v for k, v in extra.items())]
+            params = dict(pairs)
+            if params.get('sort') in ('updated_at', 'created_at'):
+                items.sort(key=lambda x: x.get(params['sort']) or '', reverse=params.get('order') == 'desc')
+            return self._page(path, pairs, items)
+
+        def create(kind, attrs):
+            obj_id = self.new_id()
+            attrs = dict(attrs, id=obj_id)
+            course[kind][obj_id] = attrs
+            return attrs
+
+        parts = rest.strip('/').split('/')
+        kind = parts[0]
+        if kind == 'quizzes':
+            if len(parts) == 1:
+                if method == 'GET':
+                    return collection('quizzes')
+                quiz = create('quizzes', dict(_settings(data.get('quiz', {})), course_id=cid))
+                return 200, quiz, {}
+            quiz_id = int(parts[1])
+            quiz = course['quizzes'][quiz_id]
+            if len(parts) == 2:
+                if method == 'DELETE':
+                    for q in [q for q in course['questions'].values() if q['quiz_id'] == quiz_id]:
+                        del course['questions'][q['id']]
+                    return 200, course['quizzes'].pop(quiz_id), {}
+                if method == 'PUT':
+                    quiz.update(_settings(data.get('quiz', {})))
+                count = sum(1 for q in course['questions'].values() if q['quiz_id'] == quiz_id)
+                return 200, dict(quiz, question_count=count), {}
+            sub = parts[2]
+            if sub == 'reorder':
+                position = 1
+                for item in data.get('order', []):
+                    item_id = int(item['id'])
+                    if item.get('type') == 'group':
+                        course['groups'][item_id]['position'] = position
+                        members = [q for q in course['questions'].values() if q.get('quiz_group_id') == item_id]
+                    else:
+                        members = [course['questions'][item_id]]
+                    for q in sorted(members, key=lambda q: (int(q.get('position') or 0), q['id'])):
+                        q['position'] = position
+                        position += 1
+                return 204, None, {}
+            if sub == 'questions':
+                if len(parts) == 3:
+                    if method == 'GET':
+                        return collection('questions', extra=dict(quiz_id=quiz_id))
+                    q = dict(data.get('question', {}), quiz_id=quiz_id)
+                    for k in ('points_possible', 'position', 'quiz_group_id'):
+                        if k in q:
+                            q[k] = _number(q[k])
+                    return 200, create('questions', q), {}
+                qid = int(parts[3])
+                if qid not in course['questions']:
+                    raise KeyError(qid)
+                if method == 'DELETE':
+                    course['questions'].pop(qid)
+                    return 204, None, {}
+                if method == 'PUT':
+                    q = dict(data.get('question', {}))
+                    for k in ('points_possible', 'position', 'quiz_group_id'):
+                        if k in q:
+                            q[k] = _number(q[k])
+                    course['questions'][qid].update(q)
+                return 200, course['questions'][qid], {}
+            if sub == 'groups':
+                if len(parts) == 3:
+                    g = dict(data.get('quiz_groups', [{}])[0], quiz_id=quiz_id)
+                    return 200, dict(quiz_groups=[create('groups', g)]), {}
+                gid = int(parts[3])
+                if gid not in course['groups']:
+                    raise KeyError(gid)
+                if method == 'DELETE':
+                    course['groups'].pop(gid)
+                    return 204, None, {}
+                if method == 'PUT':
+                    course['groups'][gid].update(data.get('quiz_groups', [{}])[0])
+                    return 200, dict(quiz_groups=[course['groups'][gid]]), {}
+                return 200, course['groups'][gid], {}
+            if sub == 'submissions':
+                if len(parts) == 5 and parts[4] == 'events':
+                    events = course['submissions'][int(parts[3])].get('events', [])
+                    status, chunk, headers = self._page(path, pairs, events)
+                    return status, dict(quiz_submission_events=chunk), headers
+                subs = [dict((k, v) for k, v in s.items() if k != 'events')
+                        for s in course['submissions'].values() if s['quiz_id'] == quiz_id]
+                status, chunk, headers = self._page(path, pairs, subs)
+                return status, dict(quiz_submissions=chunk), headers
+            raise KeyError(p)
+        if kind == 'files':
+            if len(parts) == 1 and method == 'GET':
+                return collection('files')
+            if len(parts) == 1 and method == 'POST':
+                params = dict(key='x', parent_folder_path=data.get('parent_folder_path') or '')
+                return 200, dict(upload_url='%s/upload/%d' % (self.url, cid), upload_params=params), {}
+            raise KeyError(p)
+        if kind == 'folders':
+            if len(parts) == 1:
+                return collection('folders')
+            if parts[1] == 'by_path':
+                names = [n for n in parts[2:] if n]
+                folders = [f for f in course['folders'].values() if f['full_name'] == 'course files']
+                for n in names:
+                    full = folders[-1]['full_name'] + '/' + n
+                    match = [f for f in course['folders'].values() if f['full_name'] == full]
+                    if not match:
+                        raise KeyError(full)
+                    folders.append(match[0])
+                return 200, folders, {}
+            raise KeyError(p)
+        if kind == 'modules':
+            if len(parts) == 1:
+                if method == 'GET':
+                    return collection('modules')
+                return 200, create('modules', dict(data.get('module', {}), course_id=cid)), {}
+            mid = int(parts[1])
+            if len(parts) == 2:
+                if method == 'DELETE':
+                    return 200, course['modules'].pop(mid), {}
+                return 200, course['modules'][mid], {}
+            if parts[2] == 'items':
+                if method == 'GET':
+                    return collection('items', extra=dict(module_id=mid))
+                return 200, create('items', dict(data.get('module_item', {}), module_id=mid, course_id=cid)), {}
+            raise KeyError(p)
+        if kind == 'users':
+            return collection('users')
+        if kind == 'enrollments':
+            return collection('enrollments')
+        raise KeyError(p)
+
@@ -1,3 +1,48 @@
+import importlib
+
 from .version import version as __version__
-from .c_Canvas import *
-from .latex import *
+
+
+# public name -> module. The modules are imported on first access, so e.g. `from canvas_utils import LaTeX2HTML`
+# does not import canvasapi. Submodules (canvas_utils.archive, ...) are imported on first access as well.
+_exports = {
+    'Canvas': 'c_Canvas',
+    'Course': 'c_Canvas',
+    'combine_kwargs': 'c_Canvas',
+    'get_institution_url': 'c_Canvas',
+    'obj_or_id': 'c_Canvas',
+    'CanvasCourse': 'c_CanvasCourse',
+    'CanvasQuiz': 'c_CanvasQuiz',
+    'site_config': 'config',
+    'for_each_course': 'fanout',
+    'CachingAdapter': 'http_cache',
+    'HttpCache': 'http_cache',
+    'Instrumentation': 'instrumentation',
+    'Transport': 'transport',
+    'LaTeX2HTML': 'latex',
+    'render_latex': 'latex',
+    'QuizSpec': 'quiz_spec',
+    'load_quiz_spec': 'quiz_spec',
+    'CanvasRegistry': 'registry',
+    'get_canvas': 'registry',
+}
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ModuleNotFoundError as e:
+            if e.name != '%s.%s' % (__name__, name):
+                raise
+            raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
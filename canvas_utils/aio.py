@@ -0,0 +1,320 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from .c_Canvas import Canvas
+from .images import is_file_name
+from .paging import iter_pages
+from .questions import QuestionSpec
+from .transport import Transport
+
+
+class AsyncCanvas(object):
+    """
+    asyncio counterpart of Canvas. The requests are sent by the canvasapi requester (with the pooled,
+    retrying Transport) on a private thread pool, so all features of the synchronous classes (image
+    cache, http cache, bulk helpers) are available. A semaphore bounds the no of requests in flight
+    for this client.
+
+        async with AsyncCanvas(config_section='Sites.HTW', max_concurrency=16) as canvas:
+            course = await canvas.get_course(525)
+            quiz = await course.create_quiz('Exam')
+            await quiz.new_mc_question('Q1', 'text', 'a', ['b', 'c'])
+            async for user in course.iter_users():
+                ...
+
+    :param url:             canvas url (see Canvas)
+    :param token:           access token (see Canvas)
+    :param config_section:  section of canvas.conf (see Canvas)
+    :param max_concurrency: max. no of concurrent requests
+    :param transport:       Transport (default: Transport with a pool of max_concurrency connections)
+    :param canvas:          existing Canvas client to use instead of creating one
+    :param kwargs:          further arguments of Canvas, e.g. cache
+    """
+    def __init__(self, url=None, token=None, config_section=None, max_concurrency=8, transport=None, canvas=None,
+                 **kwargs):
+        if canvas is None:
+            if transport is None:
+                transport = Transport(pool_size=max(16, max_concurrency))
+            canvas = Canvas(url, token, config_section, transport=transport, **kwargs)
+        self.canvas = canvas
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+        return False
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+
+    @property
+    def requester(self):
+        return self.canvas._Canvas__requester
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Runs a blocking function on the worker threads, bounded by the semaphore
+
+        :return: result of func(*args, **kwargs)
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def iter_pages(self, endpoint, per_page=100, **kwargs):
+        """
+        Async iteration over the pages of a paginated listing
+
+        :param endpoint: endpoint of the listing, e.g. 'courses/1/users'
+        :param per_page: page size
+        :param kwargs:   query parameters
+        :return:         async generator of pages (list of dict)
+        """
+        pages = iter_pages(self.requester, endpoint, per_page=per_page, **kwargs)
+        while True:
+            page = await self.call(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def iter_items(self, endpoint, per_page=100, **kwargs):
+        """
+        Like iter_pages, but yields the single items (dict)
+        """
+        async for page in self.iter_pages(endpoint, per_page=per_page, **kwargs):
+            for item in page:
+                yield item
+
+    def iter_courses(self, **kwargs):
+        return self.iter_items('courses', **kwargs)
+
+    async def list_courses(self):
+        async for c in self.iter_courses():
+            print('%s %s (%s)' % (c.get('course_code', ''), c.get('name', ''), c['id']))
+
+    async def get_course(self, course, use_sis_id=False, **kwargs):
+        """
+        :return: AsyncCanvasCourse
+        """
+        return AsyncCanvasCourse(self, await self.call(self.canvas.get_course, course, use_sis_id, **kwargs))
+
+
+class AsyncCanvasCourse(object):
+    """
+    asyncio counterpart of CanvasCourse. Attributes of the course (id, name, ...) are taken from the
+    wrapped CanvasCourse (self.course).
+    """
+    def __init__(self, client, course):
+        self.client = client
+        self.course = course
+
+    def __getattr__(self, name):
+        return getattr(self.course, name)
+
+    def __str__(self):
+        return str(self.course)
+
+    async def create_quiz(self, title='Quiz', **kwargs):
+        """
+        See CanvasCourse.create_quiz
+
+        :return: AsyncCanvasQuiz
+        """
+        return AsyncCanvasQuiz(self.client, await self.client.call(self.course.create_quiz, title, **kwargs))
+
+    async def create_module_2(self, module, **kwargs):
+        return await self.client.call(self.course.create_module_2, module, **kwargs)
+
+    async def create_folders(self, folders):
+        return await self.client.call(self.course.create_folders, folders)
+
+    async def get_course_folder(self):
+        async for folder in self.iter_folders():
+            if folder['full_name'] == 'course files':
+                return folder
+        return None
+
+    def iter_quizzes(self, **kwargs):
+        return self.client.iter_items('courses/{}/quizzes'.format(self.course.id), **kwargs)
+
+    def iter_files(self, **kwargs):
+        return self.client.iter_items('courses/{}/files'.format(self.course.id), **kwargs)
+
+    def iter_folders(self, **kwargs):
+        return self.client.iter_items('courses/{}/folders'.format(self.course.id), **kwargs)
+
+    def iter_modules(self, **kwargs):
+        return self.client.iter_items('courses/{}/modules'.format(self.course.id), **kwargs)
+
+    def iter_users(self, enrollment_type=['student'], **kwargs):
+        return self.client.iter_items('courses/{}/users'.format(self.course.id), enrollment_type=enrollment_type,
+                                      **kwargs)
+
+    def iter_enrollments(self, type=['StudentEnrollment'], **kwargs):
+        return self.client.iter_items('courses/{}/enrollments'.format(self.course.id), type=type, **kwargs)
+
+    async def list_quizzes(self):
+        async for q in self.iter_quizzes():
+            print('%s (%s)' % (q['title'], q['id']))
+
+    async def list_users(self, enrollment_type=['student']):
+        n = 0
+        async for u in self.iter_users(enrollment_type=enrollment_type):
+            print('%s%s%s' % (u['sortable_name'], ' '*(40-len(u['sortable_name'])), u['created_at']))
+            n += 1
+        print(f'\n{n:d} Einschreibungen\n\n')
+
+    async def delete_all_quizzes(self, dry_run=False):
+        return await self.client.call(self.course.delete_all_quizzes, self.client.max_concurrency, dry_run)
+
+    async def delete_all_files(self, dry_run=False):
+        return await self.client.call(self.course.delete_all_files, self.client.max_concurrency, dry_run)
+
+    async def delete_all_modules(self, dry_run=False):
+        return await self.client.call(self.course.delete_all_modules, self.client.max_concurrency, dry_run)
+
+    async def delete_folders(self, dry_run=False):
+        return await self.client.call(self.course.delete_folders, self.client.max_concurrency, dry_run)
+
+
+class AsyncCanvasQuiz(object):
+    """
+    asyncio counterpart of CanvasQuiz. Payloads are built one at a time (they depend on the current
+    question group), the questions are sent concurrently. Attributes of the quiz are taken from the
+    wrapped CanvasQuiz (self.quiz), which also keeps the lists groups and questions.
+    """
+    def __init__(self, client, quiz):
+        self.client = client
+        self.quiz = quiz
+        self._lock = asyncio.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.quiz, name)
+
+    def __str__(self):
+        return str(self.quiz)
+
+    def _build(self, kind, args, kwargs):
+        kwargs = dict(kwargs)
+        key = kwargs.pop('key', None)
+        method = getattr(self.quiz, 'new_%s_question' % kind)
+        spec = inspect.signature(method).bind(*args, **kwargs).arguments
+        spec['type'] = kind
+        spec['key'] = key
+        return self.quiz.build_spec(spec)
+
+    async def _new(self, kind, *args, **kwargs):
+        async with self._lock:
+            question = await self.client.call(self._build, kind, args, kwargs)
+        return await self.add_question(question)
+
+    async def add_question(self, question):
+        """
+        Sends a question and appends the result to quiz.questions
+
+        :param question: QuestionSpec or question payload (dict)
+        :return:         QuestionRef
+        """
+        ref = await self.client.call(self.quiz.send_question, QuestionSpec.coerce(question))
+        self.quiz.questions.append(ref)
+        return ref
+
+    async def new_quiz_group(self, name='', pick_count=1, points=0):
+        async with self._lock:
+            await self.client.call(self.quiz.new_quiz_group, name, pick_count, points)
+        return self.quiz.quiz_group
+
+    async def new_mc_question(self, *args, **kwargs):
+        return await self._new('mc', *args, **kwargs)
+
+    async def new_multi_answer_question(self, *args, **kwargs):
+        return await self._new('multi_answer', *args, **kwargs)
+
+    async def new_numerical_question(self, *args, **kwargs):
+        return await self._new('numerical', *args, **kwargs)
+
+    async def new_essay_question(self, *args, **kwargs):
+        return await self._new('essay', *args, **kwargs)
+
+    async def new_file_upload_question(self, *args, **kwargs):
+        return await self._new('file_upload', *args, **kwargs)
+
+    async def new_short_answer_question(self, *args, **kwargs):
+        return await self._new('short_answer', *args, **kwargs)
+
+    async def new_true_false_question(self, *args, **kwargs):
+        return await self._new('true_false', *args, **kwargs)
+
+    async def new_text_only_question(self, *args, **kwargs):
+        return await self._new('text_only', *args, **kwargs)
+
+    async def new_fill_blanks_question(self, *args, **kwargs):
+        return await self._new('fill_blanks', *args, **kwargs)
+
+    async def handle_image(self, text, image):
+        return await self.client.call(self.quiz.handle_image, text, image)
+
+    async def upload_image(self, image):
+        return await self.client.call(self.quiz.upload_image, image)
+
+    async def bulk_add_questions(self, specs):
+        """
+        Async variant of CanvasQuiz.bulk_add_questions. Distinct images are uploaded concurrently first
+        (if the quiz has an image cache), then the questions are built in order and sent concurrently.
+        quiz.questions keeps the order of specs.
+
+        :param specs: list of question specs (see CanvasQuiz.bulk_add_questions)
+        :return:      list of failures (index in specs, spec, exception), including specs which cannot be built
+        """
+        if self.quiz.image_cache is not None:
+            # bytearrays and file objects are not hashable: paths and contents are compared by value,
+            # other objects by identity
+            images = {}
+            for s in specs:
+                image = s.get('image')
+                if image is not None:
+                    if isinstance(image, (bytes, bytearray, memoryview)):
+                        key = bytes(image)
+                    elif is_file_name(image):
+                        key = image
+                    else:
+                        key = id(image)
+                    images.setdefault(key, image)
+            # an image which fails here fails again when its question is built and is reported there
+            await asyncio.gather(*[self.upload_image(image) for image in images.values()], return_exceptions=True)
+
+        queue = []
+        failures = []
+        async with self._lock:
+            for i, spec in enumerate(specs):
+                kwargs = dict(spec)
+                kind = kwargs.pop('type', None)
+                if kind == 'group':
+                    await self.client.call(self.quiz.new_quiz_group, **kwargs)
+                    continue
+                try:
+                    queue.append((i, spec, await self.client.call(self._build, kind, (), kwargs)))
+                except Exception as e:
+                    failures.append((i, spec, e))
+
+        offset = self.quiz.question_offset + len(self.quiz.questions)
+        for n, (_, _, question) in enumerate(queue):
+            if question.position is None:
+                question.position = offset + n + 1
+
+        results = await asyncio.gather(*[self.client.call(self.quiz.send_question, question)
+                                         for _, _, question in queue], return_exceptions=True)
+        for (i, spec, _), result in zip(queue, results):
+            if isinstance(result, Exception):
+                failures.append((i, spec, result))
+            else:
+                self.quiz.questions.append(result)
+        return failures
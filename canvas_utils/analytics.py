@@ -0,0 +1,264 @@
+import time
+
+from .paging import iter_items
+from .parallel import run_parallel
+
+
+CHOICE_TYPES = ('multiple_choice_question', 'true_false_question')
+FINISHED_STATES = ('complete', 'pending_review')
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('Quiz analytics requires NumPy (pip install numpy)')
+    return np
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class QuizResponses(object):
+    """
+    Answers of all submissions of a quiz in columnar form: one row per submission, one column per question.
+
+    user_ids:     user ids (n,)
+    scores:       total scores of the submissions (n,)
+    question_ids: question ids (m,)
+    points:       points possible per question (m,)
+    group_ids:    quiz group ids per question, 0 if not in a group (m,)
+    answers:      chosen answer ids (n, m), -1 if the question was not answered
+    item_scores:  points per submission and question (n, m); NaN for questions which are not choice
+                  questions and for unanswered questions of groups which pick a subset of their questions
+                  (the student may not have seen them)
+    questions:    question attributes (list of dict, in column order)
+    groups:       quiz group attributes by id (dict)
+    """
+    def __init__(self, questions, groups, submissions, answered):
+        np = _numpy()
+        self.questions = questions
+        self.groups = groups
+        self.user_ids = np.array([s.get('user_id') or 0 for s in submissions], dtype=np.int64)
+        self.scores = np.array([s.get('kept_score', s.get('score')) or 0 for s in submissions], dtype=float)
+        self.question_ids = np.array([q['id'] for q in questions], dtype=np.int64)
+        self.points = np.array([q.get('points_possible') or 0 for q in questions], dtype=float)
+        self.group_ids = np.array([q.get('quiz_group_id') or 0 for q in questions], dtype=np.int64)
+        self.types = np.array([q.get('question_type') or '' for q in questions])
+
+        column = {q['id']: j for j, q in enumerate(questions)}
+        self.answers = np.full((len(submissions), len(questions)), -1, dtype=np.int64)
+        for i, chosen in enumerate(answered):
+            for question_id, answer in chosen.items():
+                j = column.get(question_id)
+                if j is not None:
+                    self.answers[i, j] = answer
+        self.item_scores = self._score()
+
+    def _score(self):
+        np = _numpy()
+        # all answer ids of the choice questions, sorted, with their weights: one lookup for the whole matrix
+        pairs = sorted((a['id'], a.get('weight') or 0) for q in self.questions
+                       if q.get('question_type') in CHOICE_TYPES for a in q.get('answers') or [])
+        answer_ids = np.array([p[0] for p in pairs] or [-2], dtype=np.int64)
+        weights = np.array([p[1] for p in pairs] or [0], dtype=float)
+        idx = np.clip(np.searchsorted(answer_ids, self.answers), 0, len(answer_ids) - 1)
+        correct = (answer_ids[idx] == self.answers) & (weights[idx] > 0)
+
+        scores = np.where(correct, self.points, 0.0)
+        choice = np.isin(self.types, CHOICE_TYPES)
+        sampled = np.array([self._samples_group(g) for g in self.group_ids], dtype=bool)
+        unseen = (self.answers < 0) & sampled
+        return np.where(choice & ~unseen, scores, np.nan)
+
+    def _samples_group(self, group_id):
+        group = self.groups.get(int(group_id))
+        if group is None:
+            return False
+        size = int((self.group_ids == group_id).sum())
+        return (group.get('pick_count') or size) < size
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __repr__(self):
+        return '<QuizResponses: %d submissions, %d questions>' % self.answers.shape
+
+
+def load_responses(quiz, max_workers=8, per_page=100):
+    """
+    Fetches questions, groups, submissions and question events of a quiz. The listings of questions and
+    submissions run concurrently, then the events of all finished submissions and the groups are fetched
+    concurrently. The last 'question_answered' event of a question is the answer of a submission.
+
+    :param quiz:        canvasapi Quiz
+    :param max_workers: max. no of concurrent requests
+    :param per_page:    page size of the listings
+    :return:            QuizResponses
+    """
+    requester = quiz._requester
+    base = 'courses/{}/quizzes/{}'.format(quiz.course_id, quiz.id)
+
+    listings = [lambda: list(iter_items(requester, base + '/questions', per_page=per_page)),
+                lambda: list(iter_items(requester, base + '/submissions', per_page=per_page, key='quiz_submissions'))]
+    (questions, error), (submissions, error2) = run_parallel(lambda f: f(), listings, 2)
+    if error or error2:
+        raise error or error2
+    questions.sort(key=lambda q: (q.get('position') or 0, q['id']))
+    submissions = [s for s in submissions if s.get('workflow_state') in FINISHED_STATES]
+
+    def events(submission):
+        chosen = {}
+        for e in iter_items(requester, '{}/submissions/{}/events'.format(base, submission['id']), per_page=per_page,
+                            key='quiz_submission_events', attempt=submission.get('attempt')):
+            if e.get('event_type') == 'question_answered':
+                for d in e.get('event_data') or []:
+                    chosen[_int(d.get('quiz_question_id'))] = _int(d.get('answer'))
+        return chosen
+
+    def group(group_id):
+        return requester.request('GET', '{}/groups/{}'.format(base, group_id)).json()
+
+    group_ids = sorted(set(q['quiz_group_id'] for q in questions if q.get('quiz_group_id')))
+    tasks = [(events, s) for s in submissions] + [(group, g) for g in group_ids]
+    results = run_parallel(lambda task: task[0](task[1]), tasks, max_workers)
+    for result, error in results:
+        if error is not None:
+            raise error
+    answered = [r for r, _ in results[:len(submissions)]]
+    groups = {}
+    for g, _ in results[len(submissions):]:
+        g = g['quiz_groups'][0] if 'quiz_groups' in g else g
+        groups[g['id']] = g
+    return QuizResponses(questions, groups, submissions, answered)
+
+
+class ItemAnalysis(object):
+    """
+    Item statistics of a quiz, computed column-wise over all submissions
+
+    items:       one dict per choice question: id, name, type, group_id, n (no of students who saw it),
+                 difficulty (share of the points reached, 1 = everybody correct), discrimination
+                 (point-biserial correlation of the item with the rest of the total score)
+    distractors: dict question id -> list of dicts per answer: id, text, weight, count, share and
+                 mean_score (mean total score of the students who chose it); answer id -1 counts omissions
+    groups:      dict quiz group id -> score distribution of the choice items of the group
+                 (name, n, mean, std, min, q25, median, q75, max, histogram)
+    """
+    def __init__(self, responses, bins=10):
+        self.responses = responses
+        self.elapsed = 0.0
+        np = _numpy()
+        r = responses
+        choice = np.isin(r.types, CHOICE_TYPES)
+        self.columns = np.flatnonzero(choice)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = r.item_scores[:, self.columns]
+            seen = ~np.isnan(x)
+            n = seen.sum(axis=0)
+            share = np.where(seen, x / r.points[self.columns], 0.0)
+            difficulty = share.sum(axis=0) / n
+
+            # point-biserial correlation with the rest score, NaNs masked out column by column
+            rest = np.where(seen, r.scores[:, None] - np.nan_to_num(x), 0.0)
+            mean_rest = rest.sum(axis=0) / n
+            dx = np.where(seen, share - difficulty, 0.0)
+            dy = np.where(seen, rest - mean_rest, 0.0)
+            discrimination = (dx * dy).sum(axis=0) / np.sqrt((dx ** 2).sum(axis=0) * (dy ** 2).sum(axis=0))
+
+        self.items = []
+        for k, j in enumerate(self.columns):
+            q = r.questions[j]
+            self.items.append(dict(id=q['id'], name=q.get('question_name'), type=q.get('question_type'),
+                                   group_id=q.get('quiz_group_id'), n=int(n[k]), difficulty=_float(difficulty[k]),
+                                   discrimination=_float(discrimination[k])))
+        self.distractors = self._distractors(seen)
+        self.groups = self._groups(bins)
+
+    def _distractors(self, seen):
+        np = _numpy()
+        r = self.responses
+        result = {}
+        for k, j in enumerate(self.columns):
+            q = r.questions[j]
+            options = q.get('answers') or []
+            ids = np.array([a['id'] for a in options] + [-1], dtype=np.int64)
+            chose = (r.answers[:, j][:, None] == ids[None, :]) & seen[:, k][:, None]
+            count = chose.sum(axis=0)
+            total = max(int(seen[:, k].sum()), 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_score = (chose * r.scores[:, None]).sum(axis=0) / count
+            rows = []
+            for a, c, m in zip(options + [dict(id=-1, text='(no answer)', weight=None)], count, mean_score):
+                rows.append(dict(id=a['id'], text=a.get('text'), weight=a.get('weight'), count=int(c),
+                                 share=float(c) / total, mean_score=_float(m)))
+            result[q['id']] = rows
+        return result
+
+    def _groups(self, bins):
+        np = _numpy()
+        r = self.responses
+        group_ids = sorted(set(int(g) for g in r.group_ids[self.columns] if g))
+        if not group_ids:
+            return {}
+        # one matrix product sums the item scores of each group for all submissions at once
+        membership = (r.group_ids[:, None] == np.array(group_ids)[None, :]).astype(float)
+        totals = np.nan_to_num(r.item_scores) @ membership
+        result = {}
+        for k, group_id in enumerate(group_ids):
+            values = totals[:, k]
+            if not len(values):
+                result[group_id] = dict(n=0)
+                continue
+            hist, edges = np.histogram(values, bins=bins)
+            q25, median, q75 = np.percentile(values, [25, 50, 75])
+            result[group_id] = dict(name=r.groups.get(group_id, {}).get('name'), n=len(values),
+                                    mean=float(values.mean()), std=float(values.std()), min=float(values.min()),
+                                    q25=float(q25), median=float(median), q75=float(q75), max=float(values.max()),
+                                    histogram=(hist.tolist(), edges.tolist()))
+        return result
+
+    def as_dict(self):
+        return dict(submissions=len(self.responses), items=self.items,
+                    distractors={str(k): v for k, v in self.distractors.items()},
+                    groups={str(k): v for k, v in self.groups.items()}, elapsed=self.elapsed)
+
+    def table(self):
+        """
+        :return: one line per item with difficulty and discrimination (str)
+        """
+        lines = ['%-40s %5s %10s %14s' % ('question', 'n', 'difficulty', 'discrimination')]
+        for item in self.items:
+            lines.append('%-40s %5d %10.2f %14.2f' % ((item['name'] or str(item['id']))[:40], item['n'],
+                                                    _nan(item['difficulty']), _nan(item['discrimination'])))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return '%d submissions, %d items, %d groups' % (len(self.responses), len(self.items), len(self.groups))
+
+    def __repr__(self):
+        return '<ItemAnalysis: %s>' % self
+
+
+def _float(value):
+    value = float(value)
+    return None if value != value else value
+
+
+def _nan(value):
+    return float('nan') if value is None else value
+
+
+def analyze_quiz(quiz, max_workers=8, bins=10):
+    """
+    Fetches all responses of a quiz and computes its item statistics. See CanvasQuiz.item_analysis.
+    """
+    start = time.perf_counter()
+    analysis = ItemAnalysis(load_responses(quiz, max_workers=max_workers), bins=bins)
+    analysis.elapsed = time.perf_counter() - start
+    return analysis
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import re
+import time
+import zipfile
+
+from .image_cache import get_image_cache
+from .images import upload_image
+from .paging import iter_items
+from .parallel import run_parallel
+
+
+ARCHIVE_FORMAT = 'canvas_utils.quiz_archive'
+ARCHIVE_VERSION = 1
+
+# quiz settings which can be restored with CanvasCourse.create_quiz
+QUIZ_SETTINGS = ('title', 'description', 'quiz_type', 'time_limit', 'shuffle_answers', 'hide_results',
+                 'show_correct_answers', 'show_correct_answers_last_attempt', 'show_correct_answers_at',
+                 'hide_correct_answers_at', 'allowed_attempts', 'scoring_policy', 'one_question_at_a_time',
+                 'cant_go_back', 'access_code', 'ip_filter', 'due_at', 'lock_at', 'unlock_at', 'published',
+                 'one_time_results', 'only_visible_to_overrides')
+
+# question fields which are sent when a question is restored
+QUESTION_FIELDS = ('question_name', 'question_type', 'question_text', 'points_possible', 'correct_comments',
+                   'incorrect_comments', 'neutral_comments', 'correct_comments_html', 'incorrect_comments_html',
+                   'neutral_comments_html', 'text_after_answers', 'matching_answer_incorrect_matches', 'answers',
+                   'position')
+
+# references to canvas files in question texts, e.g. the <img> tags of CanvasQuiz.handle_image
+FILE_REF = re.compile(r'(?:https?://[^/"\'\s]+)?(?:/(?:courses|assessment_questions)/\d+)?/files/(\d+)/'
+                      r'(?:preview|download)(?:\?[^"\'\s<>]*)?')
+
+
+def file_references(question):
+    """
+    :param question: question (dict)
+    :return:         set of the ids of all canvas files referenced by the texts of a question
+    """
+    ids = set(int(i) for i in FILE_REF.findall(question.get('question_text') or ''))
+    for a in question.get('answers') or []:
+        ids.update(int(i) for i in FILE_REF.findall(a.get('html') or ''))
+    return ids
+
+
+def rewrite_references(question, urls):
+    """
+    Replaces the file references of a question by new urls
+
+    :param question: question (dict), changed in place
+    :param urls:     dict old file id -> new url
+    :return:         question
+    """
+    def replace(match):
+        return urls.get(int(match.group(1)), match.group(0))
+
+    if question.get('question_text'):
+        question['question_text'] = FILE_REF.sub(replace, question['question_text'])
+    for a in question.get('answers') or []:
+        if a.get('html'):
+            a['html'] = FILE_REF.sub(replace, a['html'])
+    return question
+
+
+def question_payload(question, groups=None):
+    """
+    Turns an exported question into a payload for CanvasQuiz.add_question
+
+    :param question: exported question (dict)
+    :param groups:   dict old group id -> new group id
+    :return:         payload (dict)
+    """
+    payload = {k: question[k] for k in QUESTION_FIELDS if question.get(k) is not None}
+    payload['answers'] = [{k: v for k, v in a.items() if k != 'id'} for a in question.get('answers') or []]
+    if question.get('quiz_group_id') is not None and groups:
+        payload['quiz_group_id'] = groups[question['quiz_group_id']]
+    return payload
+
+
+def fetch_file(requester, file_id):
+    """
+    Downloads a canvas file
+
+    :return: dict with the file attributes, bytes
+    """
+    attributes = requester.request('GET', 'files/{}'.format(file_id)).json()
+    response = requester._session.get(attributes['url'])
+    response.raise_for_status()
+    return attributes, response.content
+
+
+def fetch_quiz(requester, course_id, quiz):
+    """
+    :param requester: canvasapi Requester
+    :param course_id: course id
+    :param quiz:      quiz attributes (dict)
+    :return:          dict with keys quiz, groups, questions
+    """
+    base = 'courses/{}/quizzes/{}'.format(course_id, quiz['id'])
+    questions = list(iter_items(requester, base + '/questions'))
+    group_ids = sorted(set(q['quiz_group_id'] for q in questions if q.get('quiz_group_id') is not None))
+    groups = []
+    for g in group_ids:
+        group = requester.request('GET', '{}/groups/{}'.format(base, g)).json()
+        groups.append(group['quiz_groups'][0] if 'quiz_groups' in group else group)
+    return dict(quiz={k: v for k, v in quiz.items() if not k.startswith('_')}, groups=groups, questions=questions)
+
+
+def fetch_quizzes(requester, course_id, quizzes, max_workers=8):
+    """
+    Fetches the groups and questions of several quizzes concurrently
+
+    :return: list of dicts with keys quiz, groups, questions, dict of errors
+    """
+    errors = {}
+    fetched = []
+    results = run_parallel(lambda q: fetch_quiz(requester, course_id, q), quizzes, max_workers)
+    for quiz, (data, error) in zip(quizzes, results):
+        if error is None:
+            fetched.append(data)
+        else:
+            errors['quiz %s' % quiz['id']] = error
+    return fetched, errors
+
+
+def export_quizzes(course, path, max_workers=8, images=True):
+    """
+    Writes all quizzes of a course with settings, groups, questions and referenced images to a zip archive.
+    See CanvasCourse.export_quizzes.
+    """
+    requester = course._requester
+    quizzes = list(iter_items(requester, 'courses/{}/quizzes'.format(course.id)))
+    exported, errors = fetch_quizzes(requester, course.id, quizzes, max_workers)
+
+    file_ids = set()
+    if images:
+        for data in exported:
+            for q in data['questions']:
+                file_ids.update(file_references(q))
+    file_ids = sorted(file_ids)
+    files = {}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for file_id, (result, error) in zip(file_ids, run_parallel(lambda i: fetch_file(requester, i), file_ids,
+                                                                   max_workers)):
+            if error is not None:
+                errors['file %s' % file_id] = error
+                continue
+            attributes, content = result
+            files[str(file_id)] = dict(display_name=attributes.get('display_name'),
+                                       content_type=attributes.get('content-type'), size=len(content))
+            archive.writestr('images/%d' % file_id, content, compress_type=zipfile.ZIP_STORED)
+
+        manifest = dict(format=ARCHIVE_FORMAT, version=ARCHIVE_VERSION, created=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        course=dict(id=course.id, name=getattr(course, 'name', None)), quizzes=len(exported),
+                        questions=sum(len(d['questions']) for d in exported), images=files)
+        archive.writestr('manifest.json', json.dumps(manifest, indent=1))
+        archive.writestr('quizzes.json', json.dumps(exported, separators=(',', ':')))
+
+    return dict(quizzes=len(exported), questions=manifest['questions'], images=len(files), errors=errors)
+
+
+def read_archive(path):
+    """
+    :param path: file name of a quiz archive
+    :return:     manifest (dict), list of quizzes (dict with keys quiz, groups, questions), zip file
+    """
+    archive = zipfile.ZipFile(path)
+    manifest = json.loads(archive.read('manifest.json'))
+    if manifest.get('format') != ARCHIVE_FORMAT:
+        raise ValueError('%s is no quiz archive' % path)
+    if manifest.get('version', 0) > ARCHIVE_VERSION:
+        raise ValueError('Quiz archive version %s is not supported (max. %d)' % (manifest['version'], ARCHIVE_VERSION))
+    return manifest, json.loads(archive.read('quizzes.json')), archive
+
+
+def upload_files(course, files, max_workers=8):
+    """
+    Uploads files to the folder /Images of a course
+
+    :param course: CanvasCourse
+    :param files:  dict old file id -> (file name, bytes)
+    :return:       dict old file id -> preview url in course, dict old file id -> exception
+    """
+    cache = get_image_cache()
+    urls, errors = {}, {}
+
+    def upload(item):
+        file_id, (name, content) = item
+        return upload_image(course, content, name=name or 'image_%s' % file_id, cache=cache)
+
+    # files with the same content are uploaded once
+    same = {}
+    for file_id, (name, content) in sorted(files.items()):
+        same.setdefault(hashlib.sha256(content).digest(), []).append(file_id)
+    items = [(ids[0], files[ids[0]]) for ids in same.values()]
+    for ids, (url, error) in zip(same.values(), run_parallel(upload, items, max_workers)):
+        for file_id in ids:
+            if error is not None or url is None:
+                errors[file_id] = error
+            else:
+                urls[file_id] = url
+    return urls, errors
+
+
+def restore_quiz(course, data, urls=None, max_workers=4):
+    """
+    Creates a quiz with its groups and questions in course
+
+    :param course: CanvasCourse
+    :param data:   dict with keys quiz, groups, questions (as exported)
+    :param urls:   dict old file id -> url for the file references in the question texts
+    :return:       CanvasQuiz, list of failures of the question batch
+    """
+    settings = {k: data['quiz'][k] for k in QUIZ_SETTINGS if k in data['quiz']}
+    # canvas shows questions added to a published quiz only after it is saved again, so the quiz is
+    # published after its questions exist
+    published = settings.pop('published', False)
+    quiz = course.create_quiz(published=False, **settings)
+    quiz.latex = False
+
+    groups = {}
+    for g in data['groups']:
+        quiz.new_quiz_group(g.get('name', ''), g.get('pick_count', 1), g.get('question_points', 0))
+        groups[g['id']] = quiz.quiz_group.id
+
+    questions = sorted(data['questions'], key=lambda q: (q.get('position') or 0, q['id']))
+    with quiz.batch(max_workers=max_workers) as b:
+        for q in questions:
+            quiz.add_question(question_payload(rewrite_references(dict(q), urls or {}), groups))
+    if published:
+        quiz.edit(quiz=dict(published=True))
+        quiz.published = True
+    return quiz, b.failures
+
+
+def restore_all(course, quizzes, urls, errors, max_workers=8):
+    """
+    Creates several quizzes concurrently, each with up to 4 concurrent question requests
+
+    :param course:  CanvasCourse
+    :param quizzes: list of dicts with keys quiz, groups, questions
+    :param urls:    dict old file id -> url
+    :param errors:  dict the errors are added to
+    :return:        list of CanvasQuiz, errors
+    """
+    restored = []
+    results = run_parallel(lambda d: restore_quiz(course, d, urls, max_workers=4), quizzes,
+                           max(1, max_workers // 4))
+    for data, (result, error) in zip(quizzes, results):
+        if error is not None:
+            errors['quiz %s' % data['quiz'].get('title')] = error
+            continue
+        quiz, failures = result
+        restored.append(quiz)
+        for index, payload, e in failures:
+            errors['quiz %s question %s' % (quiz.title, payload.get('question_name'))] = e
+    return restored, errors
+
+
+def restore_quizzes(course, path, max_workers=8):
+    """
+    Rebuilds the quizzes of an archive in course. See CanvasCourse.restore_quizzes.
+    """
+    manifest, quizzes, archive = read_archive(path)
+    with archive:
+        files = {int(i): (f.get('display_name'), archive.read('images/%s' % i))
+                 for i, f in manifest.get('images', {}).items()}
+    urls, errors = upload_files(course, files, max_workers)
+    errors = {'file %s' % k: v for k, v in errors.items()}
+
+    return restore_all(course, quizzes, urls, errors, max_workers)
+
+
+def clone_quizzes(course, quizzes, target, max_workers=8):
+    """
+    Copies quizzes of course to target. See CanvasCourse.clone_quizzes.
+    """
+    requester = course._requester
+    attributes = []
+    for q in quizzes:
+        if isinstance(q, dict):
+            attributes.append(q)
+        elif hasattr(q, 'id'):
+            attributes.append({k: v for k, v in q.__dict__.items() if not k.startswith('_')})
+        else:
+            attributes.append(requester.request('GET', 'courses/{}/quizzes/{}'.format(course.id, q)).json())
+    fetched, errors = fetch_quizzes(requester, course.id, attributes, max_workers)
+
+    file_ids = sorted(set(i for data in fetched for q in data['questions'] for i in file_references(q)))
+    files = {}
+    results = run_parallel(lambda i: fetch_file(requester, i), file_ids, max_workers)
+    for file_id, (result, error) in zip(file_ids, results):
+        if error is None:
+            files[file_id] = (result[0].get('display_name'), result[1])
+        else:
+            errors['file %s' % file_id] = error
+    urls, failed = upload_files(target, files, max_workers)
+    errors.update(('file %s' % k, v) for k, v in failed.items())
+
+    return restore_all(target, fetched, urls, errors, max_workers)
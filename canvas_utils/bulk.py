@@ -0,0 +1,143 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from canvasapi.exceptions import Forbidden, RateLimitExceeded, ResourceDoesNotExist
+
+
+class AdaptiveLimiter(object):
+    """
+    Limits the no of concurrent requests. The limit follows the X-Rate-Limit-Remaining header of the
+    canvas responses: it grows by one while the remaining quota is above high and is halved when it
+    drops below low.
+    """
+    def __init__(self, max_workers=8, low=100.0, high=300.0):
+        self.max_workers = max_workers
+        self.low = low
+        self.high = high
+        self.limit = max(1, max_workers // 2)
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+        return False
+
+    def update(self, remaining):
+        """
+        Adapts the limit to the remaining rate limit quota
+
+        :param remaining: value of the X-Rate-Limit-Remaining header (str, float or None)
+        :return:          %
+        """
+        try:
+            remaining = float(remaining)
+        except (TypeError, ValueError):
+            return
+        with self._cond:
+            if remaining < self.low:
+                self.limit = max(1, self.limit // 2)
+            elif remaining > self.high and self.limit < self.max_workers:
+                self.limit += 1
+            self._cond.notify_all()
+
+    def throttled(self):
+        with self._cond:
+            self.limit = 1
+
+
+class BulkDeleteSummary(object):
+    """
+    Result of a bulk delete
+
+    deleted: list of ids which were deleted (or were already gone)
+    failed:  dict id -> exception
+    planned: list of ids which would have been deleted (dry run only)
+    """
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.deleted = []
+        self.failed = {}
+        self.planned = []
+
+    @property
+    def count(self):
+        return len(self.planned) if self.dry_run else len(self.deleted)
+
+    def __str__(self):
+        if self.dry_run:
+            return '%d items would be deleted' % len(self.planned)
+        return '%d deleted, %d failed' % (len(self.deleted), len(self.failed))
+
+    def __repr__(self):
+        return '<BulkDeleteSummary: %s>' % self
+
+
+def is_throttled(error):
+    """
+    :return: True, if error is a canvas rate limit error (429 or 403 with 'Rate Limit Exceeded')
+    """
+    if isinstance(error, RateLimitExceeded):
+        return True
+    return isinstance(error, Forbidden) and 'Rate Limit Exceeded' in str(error)
+
+
+def bulk_delete(requester, targets, max_workers=8, dry_run=False, retries=5, **kwargs):
+    """
+    Deletes canvas objects concurrently. The concurrency adapts to the rate limit headers, throttled
+    requests are retried with exponential backoff.
+
+    :param requester:   canvasapi requester
+    :param targets:     iterable of (id, endpoint) tuples, e.g. (12, 'courses/1/quizzes/12')
+    :param max_workers: max. no of concurrent requests
+    :param dry_run:     only count the targets, delete nothing
+    :param retries:     max. no of retries of a throttled request
+    :param kwargs:      parameters sent with every DELETE request
+    :return:            BulkDeleteSummary
+    """
+    # the listing must be complete before deleting, offset based pagination would skip items otherwise
+    targets = list(targets)
+    summary = BulkDeleteSummary(dry_run)
+    if dry_run:
+        summary.planned = [obj_id for obj_id, _ in targets]
+        return summary
+
+    limiter = AdaptiveLimiter(max_workers)
+    lock = threading.Lock()
+
+    def delete(target):
+        obj_id, endpoint = target
+        for attempt in range(retries + 1):
+            try:
+                with limiter:
+                    response = requester.request('DELETE', endpoint, **kwargs)
+                limiter.update(response.headers.get('X-Rate-Limit-Remaining'))
+                break
+            except ResourceDoesNotExist:
+                break
+            except (RateLimitExceeded, Forbidden) as e:
+                if not is_throttled(e) or attempt == retries:
+                    with lock:
+                        summary.failed[obj_id] = e
+                    return
+                limiter.throttled()
+                time.sleep(min(30.0, 0.5 * 2 ** attempt))
+            except Exception as e:
+                with lock:
+                    summary.failed[obj_id] = e
+                return
+        with lock:
+            summary.deleted.append(obj_id)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(delete, targets))
+    return summary
@@ -1,30 +1,86 @@
-import configparser as cp
-import os
-
 from canvasapi import Canvas
 from canvasapi.course import Course
 from canvasapi.util import combine_kwargs, get_institution_url, obj_or_id
 
 from .c_CanvasCourse import CanvasCourse
+from .config import site_config
+from .fanout import for_each_course
+from .http_cache import CachingAdapter, HttpCache
+from .instrumentation import Instrumentation
+from .transport import Transport
 #from c_CanvasQuiz import CanvasQuiz
 
 
 class Canvas(Canvas):
 
-    def __init__(self, url=None, token=None, config_section=None):
+    def __init__(self, url=None, token=None, config_section=None, transport=None, cache=None,
+                 instrument=False):
+        """
+        :param url:            canvas url. If url or token is None, both are read from ~/.canvasctl/canvas.conf
+        :param token:          access token
+        :param config_section: section of canvas.conf (default: 'Default')
+        :param transport:      Transport for pooled connections, retries and client side rate limiting
+                               (True: default Transport, None: plain canvasapi requester)
+        :param cache:          HttpCache for GET responses (True: default HttpCache in ~/.canvasctl, None: no cache)
+        :param instrument:     record all requests (see instrument())
+        """
         if url is None or token is None:
-            config = cp.ConfigParser()
-            _ = config.read(os.getenv('HOME') + '/.canvasctl/canvas.conf')
-            if config_section is None:
-                config_section = 'Default'
-            url = config[config_section]['URL']
-            if url[0] == '"':
-                url = url[1:-1]
-            token = config[config_section]['Token']
-            if token[0] == '"':
-                token = token[1:-1]
+            url, token = site_config(config_section)
         super(Canvas,self).__init__(url, token)
 
+        if transport is True:
+            transport = Transport()
+        if transport is not None:
+            self.__requester._session = transport.session()
+        self.transport = transport
+
+        if cache is True:
+            cache = HttpCache()
+        if cache is not None:
+            pool_size = transport.pool_size if transport is not None else 10
+            adapter = CachingAdapter(cache, pool_connections=pool_size, pool_maxsize=pool_size)
+            self.__requester._session.mount('https://', adapter)
+            self.__requester._session.mount('http://', adapter)
+        self.cache = cache
+
+        self.instrumentation = None
+        if instrument:
+            self.instrument()
+
+
+    def instrument(self, trace=False):
+        """
+        Records method, endpoint, status, bytes and latency of every request sent through this client,
+        including the requests of courses and quizzes created through it.
+
+        :param trace: keep every request for Instrumentation.export_trace
+        :return:      Instrumentation
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(trace=trace)
+            self.__requester._session.hooks['response'].append(self.instrumentation.hook)
+        elif trace and self.instrumentation.trace is None:
+            self.instrumentation.trace = []
+        return self.instrumentation
+
+
+    def uninstrument(self):
+        """
+        Removes the request hook, so requests are no longer measured
+        """
+        if self.instrumentation is not None:
+            self.__requester._session.hooks['response'].remove(self.instrumentation.hook)
+            self.instrumentation = None
+
+
+    def stats(self):
+        """
+        :return: request statistics per endpoint (dict, see Instrumentation.stats), empty if not instrumented
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.stats()
+
 
     def list_courses(self):
         """
@@ -52,6 +108,25 @@ class Canvas(Canvas):
         )
         return CanvasCourse(self.__requester, response.json())
 
+    def for_each_course(self, func, ids=(), sis_ids=(), name=None, max_workers=8, **kwargs):
+        """
+        Runs an operation on many courses concurrently and collects the results and errors per course.
+
+            report = canvas.for_each_course(lambda c: c.create_folders(['Images', 'Exams']),
+                                            name='WS 2024', max_workers=4)
+            print(report.table())
+
+        :param func:        callable CanvasCourse -> result
+        :param ids:         course ids
+        :param sis_ids:     SIS course ids
+        :param name:        select the courses of the user account whose name contains this text (case
+                            insensitive); also a compiled regular expression or a callable name -> bool
+        :param max_workers: max. no of courses processed at the same time
+        :param kwargs:      further arguments for get_courses, used with name (e.g. enrollment_state='active')
+        :return:            FanOutReport
+        """
+        return for_each_course(self, func, ids=ids, sis_ids=sis_ids, name=name, max_workers=max_workers, **kwargs)
+
 
 if __name__ == "__main__":
     canvas = Canvas(config_section='Sites.GC')
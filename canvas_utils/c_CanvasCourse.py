@@ -3,14 +3,24 @@
 
 #from canvasapi import Canvas
 from canvasapi.course import Course
+from canvasapi.exceptions import ResourceDoesNotExist
+from canvasapi.folder import Folder
 from canvasapi.util import combine_kwargs     #, get_institution_url, obj_or_id
 
+from . import archive
+from .bulk import bulk_delete
 from .c_CanvasQuiz import CanvasQuiz
+from .journal import open_journal
+from .mirror import CourseMirror
+from .paging import iter_items
+from .provisioning import FolderIndex, folder_paths, provision
+from .roster import ENROLLMENT_FIELDS, USER_FIELDS, write_records
 
 
 class CanvasCourse(Course):
     def __init__(self, requester, attributes):
         super(Course, self).__init__(requester, attributes)
+        self._folder_index = None
 
 
     def create_module_2(self, module, **kwargs):
@@ -66,6 +76,7 @@ class CanvasCourse(Course):
                     published=False,
                     one_time_results=False,
                     only_visible_to_overrides=False,
+                    journal=None,
                     **kwargs):
 
         quiz = dict(title=title, description=description, quiz_type=quiz_type,
@@ -81,6 +92,24 @@ class CanvasCourse(Course):
 
         kwargs["quiz"] = quiz
 
+        # with a journal (see journal.BuildJournal) a re-run of an interrupted build continues the quiz
+        # of the first run instead of creating a new one
+        if journal is not None:
+            journal = open_journal(self.id, journal)
+            entry = journal.get('quiz', 'quiz')
+            if entry is not None:
+                try:
+                    response = self._requester.request("GET", "courses/{}/quizzes/{}".format(self.id, entry['id']))
+                except ResourceDoesNotExist:
+                    journal.reset()
+                else:
+                    quiz_json = response.json()
+                    quiz_json.update({"course_id": self.id})
+                    my_quiz = CanvasQuiz(self._requester, quiz_json)
+                    my_quiz.course = self
+                    my_quiz.use_journal(journal)
+                    return my_quiz
+
         response = self._requester.request(
             "POST",
             "courses/{}/quizzes".format(self.id),
@@ -92,6 +121,30 @@ class CanvasCourse(Course):
         my_quiz = CanvasQuiz(self._requester, quiz_json)
         my_quiz.course = self
 
+        if journal is not None:
+            journal.record('quiz', 'quiz', my_quiz.id)
+            my_quiz.use_journal(journal)
+
+        return my_quiz
+
+
+    def get_quiz(self, quiz, **kwargs):
+        """
+        Like canvasapi's Course.get_quiz, but returns a CanvasQuiz
+
+        :param quiz: quiz id or Quiz
+        :return:     CanvasQuiz
+        """
+        response = self._requester.request(
+            "GET",
+            "courses/{}/quizzes/{}".format(self.id, getattr(quiz, 'id', quiz)),
+            _kwargs=combine_kwargs(**kwargs),
+        )
+        quiz_json = response.json()
+        quiz_json.update({"course_id": self.id})
+
+        my_quiz = CanvasQuiz(self._requester, quiz_json)
+        my_quiz.course = self
         return my_quiz
 
 
@@ -101,66 +154,274 @@ class CanvasCourse(Course):
             print(q.__str__())
 
 
-    def delete_all_quizzes(self):
+    def export_quizzes(self, path, max_workers=8, images=True):
+        """
+        Writes all quizzes of the course to a zip archive: quiz settings, groups, questions and the
+        images referenced in question and answer texts. Quizzes and images are fetched concurrently.
+
+        :param path:        file name of the archive
+        :param max_workers: max. no of concurrent requests
+        :param images:      include the referenced images? (bool)
+        :return:            dict with the no of quizzes, questions and images and the errors (dict)
+        """
+        return archive.export_quizzes(self, path, max_workers=max_workers, images=images)
+
+
+    def restore_quizzes(self, path, max_workers=8):
+        """
+        Rebuilds the quizzes of an archive written by export_quizzes in this course. The images are
+        uploaded to /Images and the <img> tags are rewritten; questions are sent in batches.
+
+        :param path:        file name of the archive
+        :param max_workers: max. no of concurrent requests
+        :return:            list of CanvasQuiz, dict of errors
+        """
+        return archive.restore_quizzes(self, path, max_workers=max_workers)
+
+
+    def clone_quiz(self, source_quiz, target_course, max_workers=8):
+        """
+        Copies a quiz of this course with its settings, groups and questions to another course.
+        Each distinct image referenced in the questions is uploaded once to /Images of the target
+        course and the <img> tags are rewritten, so the copy does not depend on this course.
+
+        :param source_quiz:   quiz of this course (Quiz or id)
+        :param target_course: CanvasCourse
+        :param max_workers:   max. no of concurrent requests
+        :return:              CanvasQuiz in target_course, dict of errors (failed images and questions)
+        """
+        cloned, errors = archive.clone_quizzes(self, [source_quiz], target_course, max_workers=max_workers)
+        if not cloned:
+            raise errors.popitem()[1]
+        return cloned[0], errors
+
+
+    def clone_quizzes(self, source_quizzes, target_course, max_workers=8):
+        """
+        Copies several quizzes of this course to another course, see clone_quiz.
+        Images shared by the quizzes are uploaded once.
+
+        :param source_quizzes: quizzes of this course (Quiz or id)
+        :param target_course:  CanvasCourse
+        :param max_workers:    max. no of concurrent requests
+        :return:               list of CanvasQuiz, dict of errors
+        """
+        return archive.clone_quizzes(self, source_quizzes, target_course, max_workers=max_workers)
+
+
+    def delete_all_quizzes(self, max_workers=8, dry_run=False):
+        """
+        Deletes all quizzes of the course
+
+        :param max_workers: max. no of concurrent requests
+        :param dry_run:     only count the quizzes
+        :return:            BulkDeleteSummary
+        """
         quizzes = self.get_quizzes()
-        for q in quizzes:
-            q.delete()
+        targets = ((q.id, 'courses/{}/quizzes/{}'.format(self.id, q.id)) for q in quizzes)
+        return bulk_delete(self._requester, targets, max_workers=max_workers, dry_run=dry_run)
 
 
-    def delete_folders(self):
-        folders = self.course.get_folders()
-        for folder in folders:
-            if folder.full_name != 'course files':
-                folder.delete()
-        return folder
+    def delete_folders(self, max_workers=8, dry_run=False):
+        """
+        Deletes all folders of the course except the course root folder. Only the top level folders
+        are deleted (with force), their content and subfolders are removed by canvas.
 
+        :param max_workers: max. no of concurrent requests
+        :param dry_run:     only count the folders
+        :return:            BulkDeleteSummary
+        """
+        folders = list(self.get_folders())
+        root = [f.id for f in folders if f.full_name == 'course files']
+        targets = [(f.id, 'folders/{}'.format(f.id)) for f in folders
+                   if f.full_name != 'course files' and (not root or f.parent_folder_id in root)]
+        summary = bulk_delete(self._requester, targets, max_workers=max_workers, dry_run=dry_run, force=True)
+        if not dry_run:
+            self._folder_index = None
+        return summary
 
-    def get_course_folder(self):
-        folders = self.get_folders()
-        for folder in folders:
-            if folder.full_name == 'course files':
-                return folder
+
+    def get_course_folder(self, per_page=100, prefetch=1):
+        """
+        :param per_page: page size of the folder listing
+        :param prefetch: no of pages fetched ahead
+        :return:         root folder of the course (Folder) or None. The listing stops at the root folder.
+        """
+        for folder in iter_items(self._requester, 'courses/{}/folders'.format(self.id), per_page=per_page,
+                                 prefetch=prefetch):
+            if folder['full_name'] == 'course files':
+                return Folder(self._requester, folder)
         return None
 
 
-    def create_folders(self, folders):
-        root = self.get_course_folder()
-        if type(folders) is list:
-            for f in folders:
-                root.create_folder(f)
-        else:
-            root.create_folder(folders)
+    def create_folders(self, folders, max_workers=8):
+        """
+        Creates folders below the course root folder. Existing folders are skipped.
+
+        :param folders:     folder path (str, e.g. 'Lectures/Week 1') or list of paths
+        :param max_workers: max. no of concurrent requests
+        :return:            ProvisionSummary
+        """
+        return self.provision(dict(folders=folders), max_workers=max_workers)
+
+
+    def folder_index(self, refresh=False):
+        """
+        :param refresh: list the folders again
+        :return:        FolderIndex of the course, listed once and cached. The cache is dropped by
+                        delete_folders; folders changed by other means need refresh.
+        """
+        if self._folder_index is None or refresh:
+            self._folder_index = FolderIndex.load(self)
+        return self._folder_index
+
+
+    def provision(self, layout, max_workers=8):
+        """
+        Creates the structure of a course in one go. Nodes which already exist (folders by path,
+        modules by name, module items by title and type) are skipped, so a layout can be applied again.
+        Folders are created level by level and modules before their items; everything else is created
+        concurrently.
+
+            course.provision(dict(
+                folders=['Images', 'Lectures/Week 1', 'Lectures/Week 2'],
+                modules=[dict(name='Machine Learning I',
+                              items=[dict(title='Lecture Notes', type='SubHeader'),
+                                     dict(title='Exercises', type='SubHeader')])]))
+
+        :param layout:      dict with optional keys folders (list of paths or nested dict) and modules
+                            (list of module attributes, each with an optional list of module items)
+        :param max_workers: max. no of concurrent requests
+        :return:            ProvisionSummary
+        """
+        index = None
+        if layout.get('folders'):
+            cached = self._folder_index is not None
+            index = self.folder_index()
+            # folders created elsewhere (e.g. by uploads to a parent_folder_path) are not in a cached index
+            if cached and any(path not in index for path in folder_paths(layout['folders'])):
+                index = self.folder_index(refresh=True)
+        return provision(self, layout, max_workers=max_workers, index=index)
+
 
+    def mirror(self, path=None, sync=True, full=False, max_workers=8):
+        """
+        Local SQLite mirror of the course content (folders, files, quizzes and questions, modules and
+        items, enrollments) for queries which would otherwise walk many listings, e.g.
+
+            m = course.mirror()
+            m.quizzes_using_file(file_id)
+            m.orphaned_files()
+            m.enrolled_since('2024-10-07')
+
+        :param path:        file name of the database (default ~/.canvasctl/mirror.sqlite)
+        :param sync:        bring the mirror up to date (only changes are fetched)
+        :param full:        list everything again, needed to notice deleted files
+        :param max_workers: max. no of concurrent requests
+        :return:            CourseMirror
+        """
+        mirror = CourseMirror(self, path, max_workers=max_workers)
+        if sync:
+            mirror.sync(full=full)
+        return mirror
 
-    def delete_all_files(self):
-        files = self.get_files()
-        for f in files:
-            f.delete()
 
+    def delete_all_files(self, max_workers=8, dry_run=False, per_page=100, prefetch=2):
+        """
+        Deletes all files of the course
+
+        :param max_workers: max. no of concurrent requests
+        :param dry_run:     only count the files
+        :param per_page:    page size of the file listing
+        :param prefetch:    no of pages fetched ahead
+        :return:            BulkDeleteSummary
+        """
+        files = iter_items(self._requester, 'courses/{}/files'.format(self.id), per_page=per_page, prefetch=prefetch)
+        targets = ((f['id'], 'files/{}'.format(f['id'])) for f in files)
+        return bulk_delete(self._requester, targets, max_workers=max_workers, dry_run=dry_run)
+
+
+    def delete_all_modules(self, max_workers=8, dry_run=False):
+        """
+        Deletes all modules of the course
 
-    def delete_all_modules(self):
+        :param max_workers: max. no of concurrent requests
+        :param dry_run:     only count the modules
+        :return:            BulkDeleteSummary
+        """
         modules = self.get_modules()
-        for mod in modules:
-            mod.delete()
+        targets = ((m.id, 'courses/{}/modules/{}'.format(self.id, m.id)) for m in modules)
+        return bulk_delete(self._requester, targets, max_workers=max_workers, dry_run=dry_run)
+
+
+    def iter_users(self, enrollment_type=['student'], per_page=100, prefetch=2, **kwargs):
+        """
+        Streams the users of the course. Each page is fetched once and not kept.
+
+        :param enrollment_type: list of enrollment types (student, teacher, ta, observer, designer)
+        :param per_page:        page size
+        :param prefetch:        no of pages fetched ahead on a background thread
+        :return:                generator of user records (dict)
+        """
+        return iter_items(self._requester, 'courses/{}/users'.format(self.id), per_page=per_page,
+                          prefetch=prefetch, enrollment_type=enrollment_type, **kwargs)
+
+
+    def iter_enrollments(self, type=['StudentEnrollment'], per_page=100, prefetch=2, **kwargs):
+        """
+        Streams the enrollments of the course. Each page is fetched once and not kept.
+
+        :param type:     list of enrollment types (StudentEnrollment, TeacherEnrollment, ...)
+        :param per_page: page size
+        :param prefetch: no of pages fetched ahead on a background thread
+        :return:         generator of enrollment records (dict)
+        """
+        return iter_items(self._requester, 'courses/{}/enrollments'.format(self.id), per_page=per_page,
+                          prefetch=prefetch, type=type, **kwargs)
 
 
-    def list_student_enrollments(self):
-        el = self.get_enrollments(type=['StudentEnrollment'])
+    def export_users(self, dest, fmt='csv', fields=USER_FIELDS, enrollment_type=['student'], per_page=100):
+        """
+        Writes the users of the course incrementally to a file or stream
+
+        :param dest:            file name (str) or text stream
+        :param fmt:             'csv' or 'jsonl'
+        :param fields:          list of fields to export (None: all)
+        :param enrollment_type: list of enrollment types
+        :param per_page:        page size
+        :return:                no of users written
+        """
+        return write_records(self.iter_users(enrollment_type, per_page), dest, fmt, fields)
+
+
+    def export_enrollments(self, dest, fmt='csv', fields=ENROLLMENT_FIELDS, type=['StudentEnrollment'], per_page=100):
+        """
+        Writes the enrollments of the course incrementally to a file or stream. Use dotted names for
+        fields of the enrolled user, e.g. 'user.sortable_name'.
+
+        :param dest:     file name (str) or text stream
+        :param fmt:      'csv' or 'jsonl'
+        :param fields:   list of fields to export (None: all)
+        :param type:     list of enrollment types
+        :param per_page: page size
+        :return:         no of enrollments written
+        """
+        return write_records(self.iter_enrollments(type, per_page), dest, fmt, fields)
+
+
+    def list_student_enrollments(self, per_page=100, prefetch=2):
         s = self.name+' ('+str(self.id)+')'
         print('%s\n%s\n'%(s, '-'*len(s)))
 
-        for l in el:
-            print('%s   (%s)'%(l.user['sortable_name'], str(l.user['id'])))
+        for l in self.iter_enrollments(type=['StudentEnrollment'], per_page=per_page, prefetch=prefetch):
+            print('%s   (%s)'%(l['user']['sortable_name'], str(l['user']['id'])))
         print('')
 
 
-    def list_users(self, enrollment_type=['student']):
-        users = self.get_users(enrollment_type=enrollment_type)
-        user_list = list(users)
-        print(f'{len(user_list):d} Einschreibungen\n')
-
-        for u in users:
-            print('%s%s%s'%(u.sortable_name, ' '*(40-len(u.sortable_name)), u.created_at))
-
-        print('\n\n')
+    def list_users(self, enrollment_type=['student'], per_page=100, prefetch=2):
+        n = 0
+        for u in self.iter_users(enrollment_type=enrollment_type, per_page=per_page, prefetch=prefetch):
+            print('%s%s%s'%(u['sortable_name'], ' '*(40-len(u['sortable_name'])), u['created_at']))
+            n += 1
 
+        print(f'\n{n:d} Einschreibungen\n\n')
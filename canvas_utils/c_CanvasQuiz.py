@@ -6,13 +6,40 @@
 #from canvasapi.util import combine_kwargs, get_institution_url, obj_or_id
 #from canvasapi.util import uri_str
 
+from canvasapi.exceptions import ResourceDoesNotExist
 from canvasapi.quiz import Quiz
+from canvasapi.quiz_group import QuizGroup
+from canvasapi.util import combine_kwargs
+
+from .analytics import analyze_quiz
+from .image_cache import get_image_cache
+from .images import upload_image
+from .journal import payload_digest
+from .latex import render_latex
+from .paging import iter_items
+from .parallel import run_parallel
+from .questions import QuestionRef, QuestionSpec
+from .quiz_spec import sync_quiz
+from .variants import numerical_variants
+
+# question types whose answer texts are shown as choices and may contain LaTeX
+CHOICE_TYPES = ('multiple_choice_question', 'multiple_answers_question', 'true_false_question')
+
 
 class CanvasQuiz(Quiz):
     def __init__(self, requester, attributes):
         super(Quiz, self).__init__(requester, attributes)
         self.groups = []
         self.questions = []
+        self._batch = None
+        self.image_cache = get_image_cache()
+        self.image_max_bytes = None
+        self.image_max_size = None
+        self.latex = True
+        self.journal = None
+        self._next_key = None
+        # questions the quiz already had in canvas; new questions are positioned after them
+        self.question_offset = getattr(self, 'question_count', None) or 0
 
     def new_quiz_group(self, name='', pick_count=1, points=0):
         """
@@ -26,7 +53,18 @@ class CanvasQuiz(Quiz):
         quiz_group = [
             dict(name=name, pick_count=pick_count, question_points=points)
         ]
-        self.quiz_group = self.create_question_group(quiz_group)
+        if self.journal is not None:
+            key = self.journal.next_key('group', name)
+            digest = payload_digest(quiz_group[0])
+            entry = self.journal.get('group', key)
+            if entry is not None and entry['hash'] == digest:
+                self.quiz_group = QuizGroup(self._requester, dict(quiz_group[0], id=entry['id'], quiz_id=self.id,
+                                                                  course_id=self.course_id))
+            else:
+                self.quiz_group = self.create_question_group(quiz_group)
+                self.journal.record('group', key, self.quiz_group.id, digest)
+        else:
+            self.quiz_group = self.create_question_group(quiz_group)
         self.groups.append(self.quiz_group)
 
     def new_mc_question(self, title, text, correct, wrong, points=1, image=None, grouped=False):
@@ -52,16 +90,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='multiple_choice_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answers)
+        new_question = QuestionSpec(title, 'multiple_choice_question', text, points, answers)
 
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
-
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_multi_answer_question(self, title, text, correct, wrong, points=1, image=None, grouped=False):
         """
@@ -83,16 +114,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='multiple_answers_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answers)
-
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+        new_question = QuestionSpec(title, 'multiple_answers_question', text, points, answers)
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_numerical_question(self, title, text,
                                answer=None, precision=None, errorMargin=None,
@@ -128,16 +152,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='numerical_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answer)
+        new_question = QuestionSpec(title, 'numerical_question', text, points, answer)
 
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
-
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_essay_question(self, title, text, points=1, image=None, grouped=False):
         """
@@ -152,15 +169,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='essay_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='', answers=[])
-
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+        new_question = QuestionSpec(title, 'essay_question', text, points)
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_file_upload_question(self, title, text, points=0, image=None, grouped=False):
         """
@@ -175,15 +186,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='file_upload_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='', answers=[])
-
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+        new_question = QuestionSpec(title, 'file_upload_question', text, points)
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_short_answer_question(self, title, text, correct, points=1, image=None, grouped=False):
         """
@@ -202,16 +207,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='short_answer_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answers)
-
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+        new_question = QuestionSpec(title, 'short_answer_question', text, points, answers)
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_true_false_question(self, title, text, correct, wrong, points=1, image=None, grouped=False):
         """
@@ -238,16 +236,9 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='true_false_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answers)
-
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+        new_question = QuestionSpec(title, 'true_false_question', text, points, answers)
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        self.add_question(new_question, grouped)
 
     def new_text_only_question(self, title, text, image=None, grouped=False):
         """
@@ -260,14 +251,8 @@ class CanvasQuiz(Quiz):
         """
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='text_only_question', question_text=text,
-                            points_possible=None, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='', answers=[])
-        if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
-
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+        new_question = QuestionSpec(title, 'text_only_question', text)
+        self.add_question(new_question, grouped)
 
     def new_fill_blanks_question(self, title, text, blanks, points=1, image=None, grouped=False):
         """
@@ -292,34 +277,332 @@ class CanvasQuiz(Quiz):
 
         text = self.handle_image(text, image)
 
-        new_question = dict(question_name=title, question_type='fill_in_multiple_blanks_question', question_text=text,
-                            points_possible=points, correct_comments='', incorrect_comments='', neutral_comments='',
-                            correct_comments_html='', incorrect_comments_html='', neutral_comments_html='',
-                            answers=answers)
+        new_question = QuestionSpec(title, 'fill_in_multiple_blanks_question', text, points, answers)
+        self.add_question(new_question, grouped)
+
+
+    def add_question(self, new_question, grouped=False):
+        """
+        Sends a question to canvas and appends its id, key and position to self.questions.
+        Inside a batch (see batch()) the question is queued and sent when the batch is flushed.
+        If self.latex is set, $...$ and $$...$$ in the question text and in the texts of choice answers
+        are rendered as canvas equation images.
+
+        :param new_question: QuestionSpec as built by the new_*_question methods or question payload (dict)
+        :param grouped:      add to the current group? (bool)
+        :return:             %
+        """
+        new_question = QuestionSpec.coerce(new_question)
+        if self._next_key is not None:
+            new_question.key, self._next_key = self._next_key, None
         if grouped:
-            new_question['quiz_group_id'] = self.quiz_group.id
+            new_question.group_id = self.quiz_group.id
+
+        if self.latex:
+            new_question.text = render_latex(new_question.text)
+            if new_question.type in CHOICE_TYPES:
+                for a in new_question.answers:
+                    html = render_latex(a['text'])
+                    if html != a['text']:
+                        a['html'] = html
+
+        if self.journal is not None:
+            new_question.key = new_question.key or self.journal.next_key('question', new_question.name)
+            entry = self.journal.get('question', new_question.key)
+            queued = len(self._batch.queue) if self._batch is not None else 0
+            position = self.question_offset + len(self.questions) + queued + 1
+            if entry is not None and entry['hash'] == payload_digest(new_question.payload()):
+                self.questions.append(QuestionRef(entry['id'], new_question.key, position))
+                return
+            if self._batch is not None and new_question.position is None:
+                # skipped questions are not queued, so the position is fixed here
+                new_question.position = position
+
+        if self._batch is not None:
+            self._batch.queue.append(new_question)
+        else:
+            self.questions.append(self.send_question(new_question))
 
-        question = self.create_question(question=new_question)
-        self.questions.append(question)
+    def send_question(self, question):
+        """
+        Creates a question in canvas. The payload is built here, the response is reduced to a QuestionRef.
 
+        :param question: QuestionSpec
+        :return:         QuestionRef
+        """
+        payload = question.payload()
+        entry = self.journal.get('question', question.key) if self.journal is not None else None
+        if entry is None:
+            response = self._requester.request(
+                "POST",
+                "courses/{}/quizzes/{}/questions".format(self.course_id, self.id),
+                _kwargs=combine_kwargs(question=payload),
+            )
+        else:
+            # changed since the last run of the build
+            response = self._requester.request(
+                "PUT",
+                "courses/{}/quizzes/{}/questions/{}".format(self.course_id, self.id, entry['id']),
+                _kwargs=combine_kwargs(question=payload),
+            )
+        data = response.json()
+        if self.journal is not None:
+            self.journal.record('question', question.key, data['id'], payload_digest(payload))
+        return QuestionRef(data['id'], question.key or question.name, data.get('position') or question.position)
+
+    def use_journal(self, journal):
+        """
+        Makes the build of this quiz resumable. Groups and questions recorded in the journal (and still
+        present in the quiz) are not created again; new ones are recorded as soon as they exist.
+        The questions of the quiz are listed once and the journaled groups are fetched concurrently to
+        verify the journal. Usually called by CanvasCourse.create_quiz(..., journal=...).
+
+        :param journal: BuildJournal
+        :return:        no of journal entries of groups and questions which no longer exist
+        """
+        dropped = 0
+        groups = journal.groups()
+        if groups:
+            def exists(entry):
+                try:
+                    self._requester.request('GET', 'courses/{}/quizzes/{}/groups/{}'.format(
+                        self.course_id, self.id, entry['id']))
+                except ResourceDoesNotExist:
+                    return False
+                return True
+
+            results = run_parallel(exists, groups, 8)
+            for _, error in results:
+                if error is not None:
+                    raise error
+            dropped += journal.verify(set(e['id'] for e, (found, _) in zip(groups, results) if found), 'group')
+        if journal.questions():
+            listing = iter_items(self._requester, 'courses/{}/quizzes/{}/questions'.format(self.course_id, self.id))
+            ids = set(q['id'] for q in listing)
+            dropped += journal.verify(ids)
+            # journaled questions are counted again when the build skips them
+            self.question_offset = len(ids - set(e['id'] for e in journal.questions()))
+        self.journal = journal
+        return dropped
+
+    def batch(self, max_workers=8):
+        """
+        Context manager which queues all new_*_question calls and sends them concurrently on exit.
+        Groups created with new_quiz_group inside the block are created immediately, so grouped
+        questions keep their quiz_group_id.
+
+            with quiz.batch(max_workers=8) as b:
+                quiz.new_mc_question(...)
+                ...
+            print(b.failures)
+
+        :param max_workers: max. no of concurrent requests
+        :return:            QuestionBatch
+        """
+        return QuestionBatch(self, max_workers)
+
+    def bulk_add_questions(self, specs, max_workers=8):
+        """
+        Creates many questions concurrently.
+
+        Each spec is a dict with a key 'type' and the keyword arguments of the matching new_*_question
+        method, e.g. dict(type='mc', title='Q1', text='...', correct='a', wrong=['b', 'c']).
+        type='group' creates a new question group with the arguments of new_quiz_group; subsequent
+        specs with grouped=True are added to it.
+
+        :param specs:       list of question specs (list of dict)
+        :param max_workers: max. no of concurrent requests
+        :return:            list of failures (index in specs, spec, exception); specs which cannot be built
+                            (e.g. an image which cannot be read) are reported as well, the others are sent
+        """
+        with self.batch(max_workers=max_workers) as b:
+            for i, spec in enumerate(specs):
+                kwargs = dict(spec)
+                kind = kwargs.pop('type', None)
+                key = kwargs.pop('key', None)
+                if kind == 'group':
+                    self.new_quiz_group(**kwargs)
+                    continue
+                queued = len(b.queue)
+                self._next_key = key
+                try:
+                    getattr(self, 'new_%s_question' % kind)(**kwargs)
+                except Exception as e:
+                    # e.g. bad arguments or an image which cannot be read or uploaded; the rest is still sent
+                    b.failures.append((i, spec, e))
+                    continue
+                finally:
+                    self._next_key = None
+                if len(b.queue) > queued:
+                    b.specs.append((i, spec))
+        return b.failures
+
+    def new_numerical_variants(self, title, text, params, answer, n, precision=None, errorMargin=None,
+                               group_name=None, pick_count=1, points=1, seed=None, max_workers=8):
+        """
+        Creates a question group with n randomized variants of a numerical question. The variants are
+        generated in one NumPy pass (see variants.numerical_variants) and sent as one batch.
+
+        :param title:       title template (str), e.g. 'Energy {i}'
+        :param text:        question text template (str), e.g. 'm = {m} kg, v = {v} m/s. E in J?'
+        :param params:      dict parameter name -> distribution, e.g. dict(m=('randint', 1, 10))
+        :param answer:      vectorized function of the parameters returning the answers
+        :param n:           no of variants
+        :param precision:   precision of the answers (number or function (answers, **params) -> array)
+        :param errorMargin: error margin of the answers (number or function (answers, **params) -> array)
+        :param group_name:  name of the question group (default: title without placeholders)
+        :param pick_count:  no of variants picked for each student
+        :param points:      no of points per picked question
+        :param seed:        seed of the random generator
+        :param max_workers: max. no of concurrent requests
+        :return:            list of failures (index, spec, exception)
+        """
+        specs = numerical_variants(title, text, params, answer, n, precision=precision, errorMargin=errorMargin,
+                                   seed=seed)
+        if group_name is None:
+            group_name = title.split('{')[0].strip() or 'Variants'
+        for spec in specs:
+            spec['points'] = points
+            spec['grouped'] = True
+        group = dict(type='group', name=group_name, pick_count=pick_count, points=points)
+        return self.bulk_add_questions([group] + specs, max_workers=max_workers)
+
+    def build_question(self, spec):
+        """
+        Builds the payload of a question without sending it. Images are uploaded, though.
+
+        :param spec: dict with a key 'type' and the keyword arguments of the matching new_*_question method
+        :return:     question payload (dict)
+        """
+        return self.build_spec(spec).payload()
+
+    def build_spec(self, spec):
+        """
+        Like build_question, but returns the QuestionSpec
+
+        :param spec: dict with a key 'type', optional 'key' and the keyword arguments of a new_*_question method
+        :return:     QuestionSpec
+        """
+        kwargs = dict(spec)
+        kind = kwargs.pop('type')
+        key = kwargs.pop('key', None)
+        capture, previous, journal = QuestionBatch(self), self._batch, self.journal
+        self._batch, self.journal, self._next_key = capture, None, key
+        try:
+            getattr(self, 'new_%s_question' % kind)(**kwargs)
+        finally:
+            self._batch, self.journal, self._next_key = previous, journal, None
+        return capture.queue[0]
+
+    def sync(self, spec, state_file=None, prune=True, max_workers=8):
+        """
+        Brings settings, groups and questions of the quiz in line with a declarative spec. Only changed
+        questions are sent; moved questions are put in place with one reorder request. Questions are matched
+        by their key; the ids and hashes of the last sync are stored in state_file (default
+        ~/.canvasctl/sync/<course_id>_<quiz_id>.json). Questions and groups without a state entry are
+        matched by their title or name.
+
+        :param spec:        QuizSpec, dict or name of a yaml/json file (see load_quiz_spec)
+        :param state_file:  file name of the sync state
+        :param prune:       delete questions and groups which are not part of the spec
+        :param max_workers: max. no of concurrent requests
+        :return:            SyncSummary
+        """
+        return sync_quiz(self, spec, state_file=state_file, prune=prune, max_workers=max_workers)
+
+    def item_analysis(self, max_workers=8, bins=10):
+        """
+        Item analysis of the submitted attempts: difficulty and discrimination of the multiple choice and
+        true/false questions, distractor frequencies and score distributions per question group.
+
+        Submissions and questions are listed concurrently, the question events of all submissions are
+        fetched concurrently; the statistics are computed with NumPy over all submissions at once.
+
+        :param max_workers: max. no of concurrent requests
+        :param bins:        no of histogram bins of the group score distributions
+        :return:            ItemAnalysis (see analytics.ItemAnalysis)
+        """
+        return analyze_quiz(self, max_workers=max_workers, bins=bins)
 
     def get_question(self, question_id):
-        return self.quiz.get_question(question_id)
+        return super(CanvasQuiz, self).get_question(question_id)
 
 
     def handle_image(self, text, image):
+        """
+        Uploads an image to the folder /Images of the course and replaces the keyword %IMAGE% in text
+        by an <img> tag. Images already uploaded to the course are taken from self.image_cache.
+
+        :param text:  question text (str)
+        :param image: path of the image file (str), bytes, binary file object, matplotlib figure or None
+        :return:      text
+        """
         if image is not None:
-            success, res = self.course.upload(image, parent_folder_path='/Images')
-            #success, res = self.upload(image, parent_folder_path='/Images')
-            if success:
-                image_ref = res['preview_url']
-                pos = image_ref.find('file_preview')
+            image_ref = self.upload_image(image)
+            if image_ref is not None:
+                image_ref = '<img src="' + image_ref + '" alt="You should see an image here"  />'
+                kw = '%IMAGE%'
+                pos = text.find(kw)
                 if pos != -1:
-                    image_ref = '<img src="' + \
-                        image_ref[:pos] + \
-                        'preview" alt="You should see an image here"  />'
-                    kw = '%IMAGE%'
-                    pos = text.find(kw)
-                    if pos != -1:
-                        text = text[:pos] + image_ref + text[pos+len(kw):]
+                    text = text[:pos] + image_ref + text[pos+len(kw):]
         return text
+
+    def upload_image(self, image):
+        """
+        Uploads an image to the folder /Images of the course. Images in memory (bytes, file objects,
+        matplotlib figures) are sent directly without a temp file. If self.image_max_size (pixels) or
+        self.image_max_bytes is set, larger images are downscaled and recompressed first (needs Pillow).
+
+        :param image: path of the image file (str), bytes, binary file object or matplotlib figure
+        :return:      preview url of the image (str) or None
+        """
+        return upload_image(self.course, image, cache=self.image_cache, max_bytes=self.image_max_bytes,
+                            max_size=self.image_max_size)
+
+class QuestionBatch(object):
+    """
+    Queue of questions (QuestionSpec) for a CanvasQuiz. Use CanvasQuiz.batch() to create one.
+    """
+    def __init__(self, quiz, max_workers=8):
+        self.quiz = quiz
+        self.max_workers = max_workers
+        self.queue = []
+        self.specs = []
+        self.failures = []
+
+    def __enter__(self):
+        if self.quiz._batch is not None:
+            raise RuntimeError('A batch is already active for this quiz')
+        self.quiz._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quiz._batch = None
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def flush(self):
+        """
+        Sends all queued questions. The positions are fixed in queue order after the questions the quiz
+        already has, so the quiz shows the questions in the order of the calls. self.quiz.questions is extended in the same order,
+        failed questions are left out and reported in self.failures.
+
+        :return: list of failures (index, spec or payload, exception)
+        """
+        queue, self.queue = self.queue, []
+        specs, self.specs = self.specs, []
+        offset = self.quiz.question_offset + len(self.quiz.questions)
+        for i, new_question in enumerate(queue):
+            if new_question.position is None:
+                new_question.position = offset + i + 1
+
+        results = run_parallel(self.quiz.send_question, queue, self.max_workers)
+
+        for i, (question, error) in enumerate(results):
+            if error is None:
+                self.quiz.questions.append(question)
+            else:
+                index, spec = specs[i] if i < len(specs) else (i, queue[i].payload())
+                self.failures.append((index, spec, error))
+        return self.failures
@@ -0,0 +1,101 @@
+"""
+Command line interface for the common operations
+
+    canvasctl courses
+    canvasctl users 12345 --type student teacher
+    canvasctl enrollments 12345
+    canvasctl delete quizzes files 12345 --dry-run
+    canvasctl delete all 12345 --yes
+
+The url and token are read from ~/.canvasctl/canvas.conf (section Default or --section) unless
+--url and --token are given.
+"""
+import argparse
+import sys
+
+
+DELETE_KINDS = ('quizzes', 'files', 'modules', 'folders')
+
+
+def _canvas(args):
+    # imported here, so that --help and argument errors do not import canvasapi
+    from .c_Canvas import Canvas
+
+    return Canvas(args.url, args.token, config_section=args.section, transport=True)
+
+
+def _course(canvas, args):
+    return canvas.get_course(args.course, use_sis_id=args.sis)
+
+
+def courses(args):
+    _canvas(args).list_courses()
+
+
+def users(args):
+    _course(_canvas(args), args).list_users(enrollment_type=args.type)
+
+
+def enrollments(args):
+    _course(_canvas(args), args).list_student_enrollments()
+
+
+def delete(args):
+    kinds = DELETE_KINDS if 'all' in args.kinds else [k for k in DELETE_KINDS if k in args.kinds]
+    course = _course(_canvas(args), args)
+    methods = dict(quizzes=course.delete_all_quizzes, files=course.delete_all_files,
+                   modules=course.delete_all_modules, folders=course.delete_folders)
+    failed = 0
+    for kind in kinds:
+        summary = methods[kind](max_workers=args.workers, dry_run=args.dry_run)
+        print('%-8s %s' % (kind, summary))
+        failed += len(summary.failed)
+    return 1 if failed else 0
+
+
+def parser():
+    p = argparse.ArgumentParser(prog='canvasctl', description=__doc__,
+                                formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--section', help='section of canvas.conf (default: Default)')
+    p.add_argument('--url', help='canvas url (instead of canvas.conf, needs --token)')
+    p.add_argument('--token', help='access token')
+    sub = p.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    s = sub.add_parser('courses', help='list the courses of the account')
+    s.set_defaults(func=courses)
+
+    def course_arguments(s):
+        s.add_argument('course', help='course id (or sis course id with --sis)')
+        s.add_argument('--sis', action='store_true', help='course is a sis course id')
+
+    s = sub.add_parser('users', help='list the users of a course')
+    course_arguments(s)
+    s.add_argument('--type', nargs='+', default=['student'], help='enrollment types (default: student)')
+    s.set_defaults(func=users)
+
+    s = sub.add_parser('enrollments', help='list the student enrollments of a course')
+    course_arguments(s)
+    s.set_defaults(func=enrollments)
+
+    s = sub.add_parser('delete', help='delete all quizzes, files, modules or folders of a course')
+    s.add_argument('kinds', nargs='+', choices=DELETE_KINDS + ('all',), metavar='kind',
+                   help='%s or all' % ', '.join(DELETE_KINDS))
+    course_arguments(s)
+    s.add_argument('--dry-run', action='store_true', help='only count the objects')
+    s.add_argument('--yes', action='store_true', help='really delete (required unless --dry-run)')
+    s.add_argument('--workers', type=int, default=8, help='max. no of concurrent requests')
+    s.set_defaults(func=delete)
+    return p
+
+
+def main(argv=None):
+    p = parser()
+    args = p.parse_args(argv)
+    if args.func is delete and not (args.yes or args.dry_run):
+        p.error('delete needs --yes (or --dry-run to only count)')
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import configparser as cp
+import os
+import threading
+
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.expanduser('~'), '.canvasctl', 'canvas.conf')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _strip_quotes(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        value = value[1:-1]
+    return value
+
+
+def load_config(path=None):
+    """
+    Reads canvas.conf. The file is parsed once and parsed again only if it was modified.
+
+    :param path: file name (default ~/.canvasctl/canvas.conf)
+    :return:     dict section -> dict(url=..., token=...) of all sections with a URL or a Token entry
+    """
+    path = path or DEFAULT_CONFIG_FILE
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        config = cp.ConfigParser()
+        config.read(path)
+        sites = {}
+        for section in config.sections():
+            entries = config[section]
+            if 'URL' in entries or 'Token' in entries:
+                sites[section] = dict(url=_strip_quotes(entries.get('URL', '')),
+                                      token=_strip_quotes(entries.get('Token', '')))
+        _cache[path] = (mtime, sites)
+        return sites
+
+
+def validate_config(path=None):
+    """
+    Checks all sections of canvas.conf
+
+    :param path: file name (default ~/.canvasctl/canvas.conf)
+    :return:     dict section -> list of problems (str) for all sections with problems
+    """
+    problems = {}
+    for section, site in load_config(path).items():
+        p = []
+        if not site['url']:
+            p.append('URL is missing')
+        elif not site['url'].startswith(('https://', 'http://')):
+            p.append('URL must start with https://')
+        if not site['token'] or site['token'] == 'YOUR TOKEN GOES HERE':
+            p.append('Token is missing')
+        if p:
+            problems[section] = p
+    return problems
+
+
+def site_config(section=None, path=None):
+    """
+    :param section: section of canvas.conf (default: 'Default')
+    :param path:    file name (default ~/.canvasctl/canvas.conf)
+    :return:        url, token
+    """
+    section = section or 'Default'
+    sites = load_config(path)
+    if section not in sites:
+        raise KeyError('No section [%s] with URL and Token in %s' % (section, path or DEFAULT_CONFIG_FILE))
+    return sites[section]['url'], sites[section]['token']
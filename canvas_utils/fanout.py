@@ -0,0 +1,136 @@
+import re
+import time
+
+from .c_CanvasCourse import CanvasCourse
+from .parallel import run_parallel
+
+
+class CourseResult(object):
+    """
+    Outcome of an operation on one course
+
+    key:     selector which picked the course (id, 'sis:<id>' or course id for name matches)
+    course:  CanvasCourse or None, if it could not be fetched
+    result:  return value of the operation
+    error:   exception or None
+    elapsed: wall time in s
+    """
+    def __init__(self, key, course=None, result=None, error=None, elapsed=0.0):
+        self.key = key
+        self.course = course
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def as_dict(self):
+        return dict(key=self.key, course_id=getattr(self.course, 'id', None),
+                    name=getattr(self.course, 'name', None), ok=self.ok, result=self.result,
+                    error=None if self.error is None else '%s: %s' % (type(self.error).__name__, self.error),
+                    elapsed=self.elapsed)
+
+    def __repr__(self):
+        return '<CourseResult %s: %s>' % (self.key, 'ok' if self.ok else repr(self.error))
+
+
+class FanOutReport(object):
+    """
+    Results of Canvas.for_each_course, one CourseResult per selected course in selector order
+    """
+    def __init__(self, results, elapsed=0.0):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def by_course(self):
+        """
+        :return: dict course id (or key, if the course was not found) -> CourseResult
+        """
+        return {getattr(r.course, 'id', r.key): r for r in self.results}
+
+    def raise_on_error(self):
+        """
+        Raises the first error, if any operation failed
+        """
+        for r in self.results:
+            if r.error is not None:
+                raise r.error
+
+    def as_dict(self):
+        return dict(elapsed=self.elapsed, succeeded=len(self.succeeded), failed=len(self.failed),
+                    results=[r.as_dict() for r in self.results])
+
+    def table(self):
+        """
+        :return: one line per course with status and time (str)
+        """
+        lines = []
+        for r in self.results:
+            name = getattr(r.course, 'name', '') or ''
+            status = 'ok' if r.ok else '%s: %s' % (type(r.error).__name__, r.error)
+            lines.append('%-14s %-40s %7.2f s  %s' % (r.key, name[:40], r.elapsed, status))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return '%d courses, %d ok, %d failed in %.2f s' % (len(self.results), len(self.succeeded),
+                                                           len(self.failed), self.elapsed)
+
+    def __repr__(self):
+        return '<FanOutReport: %s>' % self
+
+
+def name_matcher(name):
+    """
+    :param name: substring (case insensitive), compiled regular expression or callable name -> bool
+    :return:     callable name -> bool
+    """
+    if callable(name):
+        return name
+    if isinstance(name, str):
+        name = re.compile(re.escape(name), re.IGNORECASE)
+    return lambda n: name.search(n or '') is not None
+
+
+def for_each_course(canvas, func, ids=(), sis_ids=(), name=None, max_workers=8, **kwargs):
+    """
+    Runs func(course) for all selected courses concurrently. See Canvas.for_each_course.
+    """
+    targets = [(course_id, lambda c=course_id: canvas.get_course(c)) for course_id in ids]
+    targets += [('sis:%s' % sis_id, lambda s=sis_id: canvas.get_course(s, use_sis_id=True)) for sis_id in sis_ids]
+    if name is not None:
+        match = name_matcher(name)
+        seen = set(key for key, _ in targets)
+        for c in canvas.get_courses(**kwargs):
+            if c.id not in seen and match(getattr(c, 'name', None)):
+                attributes = {k: v for k, v in c.__dict__.items() if not k.startswith('_')}
+                targets.append((c.id, lambda a=attributes, r=c._requester: CanvasCourse(r, a)))
+
+    def run(target):
+        key, get = target
+        start = time.perf_counter()
+        course = None
+        try:
+            course = get()
+            return CourseResult(key, course, func(course), elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return CourseResult(key, course, error=e, elapsed=time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = [result for result, _ in run_parallel(run, targets, max_workers)]
+    return FanOutReport(results, time.perf_counter() - start)
@@ -0,0 +1,9 @@
+import hashlib
+import json
+
+
+def digest(data):
+    """
+    :return: hash of json data, independent of the key order (str)
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+DEFAULT_CACHE_DB = os.path.join(os.path.expanduser('~'), '.canvasctl', 'http_cache.sqlite')
+
+# seconds a cached listing is served without asking canvas; afterwards it is revalidated with its ETag
+DEFAULT_TTLS = {
+    r'/courses$': 300,
+    r'/courses/\d+$': 300,
+    r'/folders$': 60,
+    r'/quizzes$': 60,
+    r'/modules$': 60,
+}
+
+_course_re = re.compile(r'/courses/(\d+)')
+_api_re = re.compile(r'/api/v1/([^/?]+)')
+
+
+class HttpCache(object):
+    """
+    Persistent cache of GET responses in a SQLite database (default ~/.canvasctl/http_cache.sqlite).
+
+    Responses are keyed by url, query and access token. Within the ttl of an endpoint a response is
+    served from the cache, afterwards it is revalidated with If-None-Match; a 304 answer costs no
+    download. Any other request (POST, PUT, DELETE) invalidates the cached responses of the same
+    course, or of the same resource type (e.g. all 'folders' urls) if the url contains no course.
+
+    :param path:        file name of the database
+    :param ttls:        dict regex -> seconds, matched against the url path (first match wins)
+    :param default_ttl: ttl of all other endpoints (0: always revalidate)
+    """
+    def __init__(self, path=DEFAULT_CACHE_DB, ttls=None, default_ttl=0):
+        self.path = path
+        self.ttls = [(re.compile(k), v) for k, v in (DEFAULT_TTLS if ttls is None else ttls).items()]
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, path TEXT, course TEXT, '
+                             'etag TEXT, headers TEXT, body BLOB, stored REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_course ON responses (course)')
+            self._db.commit()
+        return self._db
+
+    def ttl(self, path):
+        for pattern, seconds in self.ttls:
+            if pattern.search(path):
+                return seconds
+        return self.default_ttl
+
+    @staticmethod
+    def key(request):
+        token = request.headers.get('Authorization', '')
+        return hashlib.sha1((request.url + '\n' + token).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            return self.db.execute('SELECT etag, headers, body, stored FROM responses WHERE key=?', (key,)).fetchone()
+
+    def put(self, key, url, response):
+        path = urlsplit(url).path
+        course = _course_re.search(path)
+        headers = json.dumps({k: v for k, v in response.headers.items()
+                              if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')})
+        with self._lock:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (key, path, course.group(1) if course else None, response.headers.get('ETag'),
+                             headers, response.content, time.time()))
+            self.db.commit()
+
+    def touch(self, key):
+        with self._lock:
+            self.db.execute('UPDATE responses SET stored=? WHERE key=?', (time.time(), key))
+            self.db.commit()
+
+    def invalidate(self, url):
+        """
+        Drops all responses which may be affected by a write to url
+        """
+        path = urlsplit(url).path
+        course = _course_re.search(path)
+        resource = _api_re.search(path)
+        with self._lock:
+            if course:
+                cursor = self.db.execute('DELETE FROM responses WHERE course=?', (course.group(1),))
+            elif resource:
+                cursor = self.db.execute('DELETE FROM responses WHERE path LIKE ?', ('%/' + resource.group(1) + '%',))
+            else:
+                return
+            self.invalidated += cursor.rowcount
+            self.db.commit()
+
+    def clear(self):
+        with self._lock:
+            self.db.execute('DELETE FROM responses')
+            self.db.commit()
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """
+        :return: dict with the no of hits (served from cache), revalidated (304), misses and invalidated entries
+        """
+        requests = self.hits + self.revalidated + self.misses
+        return dict(hits=self.hits, revalidated=self.revalidated, misses=self.misses, invalidated=self.invalidated,
+                    hit_rate=(self.hits + self.revalidated) / requests if requests else 0.0)
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    requests transport adapter which answers GET requests from an HttpCache
+    """
+    def __init__(self, cache, *args, **kwargs):
+        super(CachingAdapter, self).__init__(*args, **kwargs)
+        self.cache = cache
+
+    def _cached_response(self, request, headers, body):
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def send(self, request, **kwargs):
+        cache = self.cache
+        if request.method != 'GET':
+            response = super(CachingAdapter, self).send(request, **kwargs)
+            if response.status_code < 400:
+                cache.invalidate(request.url)
+            return response
+
+        key = cache.key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            etag, headers, body, stored = entry
+            if time.time() - stored < cache.ttl(urlsplit(request.url).path):
+                cache.count('hits')
+                return self._cached_response(request, headers, body)
+            if etag:
+                request.headers['If-None-Match'] = etag
+
+        response = super(CachingAdapter, self).send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            cache.count('revalidated')
+            cache.touch(key)
+            return self._cached_response(request, entry[1], entry[2])
+
+        cache.count('misses')
+        if response.status_code == 200:
+            cache.put(key, request.url, response)
+        return response
@@ -0,0 +1,202 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:     # windows: no lock, the merge on save still keeps entries of other processes
+    fcntl = None
+
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.canvasctl', 'image_cache.json')
+
+
+class ImageCache(object):
+    """
+    Persistent cache of uploaded images. Maps course id and the sha256 of the image content to the
+    canvas file id and the resolved preview url, so the same image is uploaded only once per course.
+
+    The cache is a small json file. It is bounded by max_entries (least recently used entries are
+    evicted first) and max_age (entries not used for max_age seconds are dropped).
+
+    Cache hits only update the entry in memory; the file is written by put, invalidate and flush
+    (called at exit). Writing takes a file lock and merges the entries other processes saved in the
+    meantime, so concurrent notebooks do not drop each other's uploads.
+    """
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_entries=2000, max_age=180*24*3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = None
+        self._verified = set()
+        self._removed = set()
+        self._touched = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def content_hash(image):
+        """
+        Computes the sha256 of an image
+
+        :param image: path of the image file (str) or image content (bytes)
+        :return:      hex digest (str)
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(image).hexdigest()
+        h = hashlib.sha256()
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save(self):
+        with self._file_lock():
+            self._write()
+
+    def _write(self):
+        # the file is the base, only entries changed here since the last save are merged into it; this keeps
+        # what other processes saved or removed in the meantime. For an entry changed on both sides the later
+        # use wins.
+        local = self._load()
+        entries = self._read()
+        for key in self._removed:
+            entries.pop(key, None)
+        for key in self._touched:
+            if key in local and (key not in entries or local[key]['used'] >= entries[key]['used']):
+                entries[key] = local[key]
+        self._removed.clear()
+        self._touched.clear()
+        self._entries = entries
+        now = time.time()
+        for key in [k for k, e in entries.items() if now - e['used'] > self.max_age]:
+            del entries[key]
+        if len(entries) > self.max_entries:
+            lru = sorted(entries, key=lambda k: entries[k]['used'])
+            for key in lru[:len(entries) - self.max_entries]:
+                del entries[key]
+
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def flush(self):
+        """
+        Writes the cache file, if entries were used since the last save
+        """
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get(self, course_id, digest):
+        """
+        :return: cache entry (dict with keys 'file_id', 'url', 'used') or None
+        """
+        with self._lock:
+            return self._load().get('%s:%s' % (course_id, digest))
+
+    def put(self, course_id, digest, file_id, url):
+        with self._lock:
+            key = '%s:%s' % (course_id, digest)
+            self._load()[key] = dict(file_id=file_id, url=url, used=time.time())
+            self._removed.discard(key)
+            self._touched.add(key)
+            self._verified.add(key)
+            self._save()
+
+    def invalidate(self, course_id, digest):
+        with self._lock:
+            key = '%s:%s' % (course_id, digest)
+            self._removed.add(key)
+            self._touched.discard(key)
+            if self._load().pop(key, None) is not None:
+                self._save()
+            self._verified.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._verified.clear()
+            self._touched.clear()
+            with self._file_lock():
+                self._removed.update(self._read())
+                self._write()
+
+    def lookup(self, course, digest):
+        """
+        Returns the cached url for an image in a course. The remote file is checked once per
+        session; if it is gone, the entry is invalidated.
+
+        :param course: CanvasCourse
+        :param digest: content hash of the image
+        :return:       url (str) or None
+        """
+        from canvasapi.exceptions import ResourceDoesNotExist
+
+        with self._lock:
+            key = '%s:%s' % (course.id, digest)
+            entry = self._load().get(key)
+            if entry is None:
+                return None
+            verified = key in self._verified
+
+        if not verified:
+            try:
+                course._requester.request('GET', 'files/{}'.format(entry['file_id']))
+            except ResourceDoesNotExist:
+                self.invalidate(course.id, digest)
+                return None
+
+        with self._lock:
+            self._verified.add(key)
+            entry['used'] = time.time()
+            self._touched.add(key)
+            self._dirty = True
+        return entry['url']
+
+
+_default_cache = None
+
+
+def get_image_cache():
+    """
+    :return: the ImageCache shared by all quizzes (stored in ~/.canvasctl/image_cache.json)
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ImageCache()
+    return _default_cache
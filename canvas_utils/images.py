@@ -0,0 +1,210 @@
+import io
+import json
+import os
+
+from canvasapi.util import combine_kwargs
+
+
+# magic numbers of the image formats canvas can show inline
+SIGNATURES = ((b'\x89PNG\r\n\x1a\n', '.png', 'image/png'), (b'\xff\xd8\xff', '.jpg', 'image/jpeg'),
+              (b'GIF8', '.gif', 'image/gif'), (b'<svg', '.svg', 'image/svg+xml'), (b'<?xml', '.svg', 'image/svg+xml'))
+CONTENT_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+                 '.svg': 'image/svg+xml', '.webp': 'image/webp'}
+
+
+def is_file_name(image):
+    return isinstance(image, (str, os.PathLike))
+
+
+def sniff_type(data):
+    """
+    :param data: image content (bytes)
+    :return:     file extension, content type, e.g. ('.png', 'image/png')
+    """
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp', 'image/webp'
+    for signature, ext, content_type in SIGNATURES:
+        if data.startswith(signature):
+            return ext, content_type
+    return '', 'application/octet-stream'
+
+
+def load_image(image, name=None):
+    """
+    Reads an image into memory
+
+    :param image: path of an image file, bytes, a binary file object (e.g. io.BytesIO) or a
+                  matplotlib figure (anything with savefig), which is rendered as png
+    :param name:  file name used for the upload (default: derived from image)
+    :return:      file name, content (bytes)
+    """
+    if is_file_name(image):
+        with open(image, 'rb') as f:
+            return name or os.path.basename(os.fspath(image)), f.read()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+    elif hasattr(image, 'savefig'):
+        buffer = io.BytesIO()
+        image.savefig(buffer, format='png', bbox_inches='tight')
+        data = buffer.getvalue()
+    elif hasattr(image, 'read'):
+        # read from the current position and go back there, so the same object can be used again
+        try:
+            position = image.tell()
+        except (AttributeError, OSError):
+            position = None
+        data = image.read()
+        if position is not None:
+            image.seek(position)
+        name = name or os.path.basename(getattr(image, 'name', '') or '') or None
+    else:
+        raise ValueError('Unsupported image: %r' % type(image))
+
+    if not name:
+        name = 'image' + sniff_type(data)[0]
+    return name, data
+
+
+def _encode(img, fmt, quality=None):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        img.convert('RGB').save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def fit_image(name, data, max_bytes=None, max_size=None):
+    """
+    Downscales and recompresses an image until it fits into a byte budget. Images which are neither too
+    large nor over the budget are returned unchanged. JPEG stays JPEG; PNG stays PNG as long as possible,
+    images without transparency are turned into JPEG if PNG does not fit. An encoding larger than the
+    original is only used if the budget requires it (i.e. never without max_bytes). SVG and images Pillow
+    cannot read are returned unchanged.
+
+    :param name:      file name (str)
+    :param data:      image content (bytes)
+    :param max_bytes: byte budget (None: no budget)
+    :param max_size:  max. width and height in pixels (None: keep the size)
+    :return:          file name (extension adjusted to the format), content (bytes)
+    """
+    if (max_bytes is None or len(data) <= max_bytes) and max_size is None:
+        return name, data
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError('Recompressing images requires Pillow (pip install Pillow)')
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except OSError:
+        return name, data
+
+    source_format = img.format
+    over_budget = max_bytes is not None and len(data) > max_bytes
+    if max_size is not None and max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+    elif not over_budget:
+        return name, data
+
+    alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if alpha:
+        candidates = [('PNG', None)]
+    elif source_format == 'JPEG':
+        candidates = [('JPEG', 85), ('JPEG', 70), ('JPEG', 55), ('PNG', None)]
+    else:
+        candidates = [('PNG', None), ('JPEG', 85), ('JPEG', 70), ('JPEG', 55)]
+    # within the budget, but not larger than the original
+    limit = min(max_bytes, len(data)) if max_bytes is not None else len(data)
+    best = None
+    for _ in range(8):
+        for fmt, quality in candidates:
+            encoded = _encode(img, fmt, quality)
+            if best is None or len(encoded) < len(best[1]):
+                best = (fmt, encoded)
+            if len(encoded) <= limit:
+                best = (fmt, encoded)
+                break
+        else:
+            # only the byte budget justifies scaling down further
+            if not over_budget or len(best[1]) <= max_bytes:
+                break
+            img = img.resize((max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75))), Image.LANCZOS)
+            continue
+        break
+
+    fmt, encoded = best
+    if len(encoded) > len(data) and not over_budget:
+        return name, data
+    return os.path.splitext(name)[0] + ('.jpg' if fmt == 'JPEG' else '.png'), encoded
+
+
+def upload_bytes(course, name, data, parent_folder_path='/Images'):
+    """
+    Uploads an in-memory file to a course folder with canvas' two step upload, without a temp file
+
+    :param course:             canvasapi Course
+    :param name:               file name (str)
+    :param data:               content (bytes)
+    :param parent_folder_path: target folder
+    :return:                   success (bool), file attributes (dict)
+    """
+    requester = course._requester
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower()) or sniff_type(data)[1]
+    response = requester.request('POST', 'courses/{}/files'.format(course.id),
+                                 _kwargs=combine_kwargs(name=name, size=len(data), content_type=content_type,
+                                                        parent_folder_path=parent_folder_path))
+    ticket = response.json()
+    if not ticket.get('upload_url'):
+        raise ValueError('Bad API response. No upload_url.')
+    response = requester.request('POST', use_auth=False, _url=ticket['upload_url'],
+                                 file=(name, io.BytesIO(data), content_type),
+                                 _kwargs=combine_kwargs(**ticket.get('upload_params', {})))
+    attributes = json.loads(response.text.lstrip('while(1);'))
+    return 'url' in attributes, attributes
+
+
+def upload_image(course, image, name=None, cache=None, max_bytes=None, max_size=None, parent_folder_path='/Images'):
+    """
+    Uploads an image to a course folder unless the cache knows it already. Images in memory (bytes, file
+    objects, matplotlib figures) are sent directly without a temp file. With max_bytes or max_size larger
+    images are downscaled and recompressed first (needs Pillow).
+
+    :param course:             CanvasCourse
+    :param image:              path of the image file (str), bytes, binary file object or matplotlib figure
+    :param name:               file name used for the upload (default: derived from image)
+    :param cache:              ImageCache or None
+    :param max_bytes:          byte budget of the image (None: no budget)
+    :param max_size:           max. width and height in pixels (None: keep the size)
+    :param parent_folder_path: target folder
+    :return:                   preview url of the image (str) or None
+    """
+    recompress = max_bytes is not None or max_size is not None
+    if is_file_name(image) and name is None and not recompress:
+        name, data = image, None
+    else:
+        name, data = load_image(image, name)
+        name, data = fit_image(name, data, max_bytes, max_size)
+
+    if cache is not None:
+        digest = cache.content_hash(name if data is None else data)
+        url = cache.lookup(course, digest)
+        if url is not None:
+            return url
+
+    if data is None:
+        success, res = course.upload(image, parent_folder_path=parent_folder_path)
+    else:
+        success, res = upload_bytes(course, name, data, parent_folder_path=parent_folder_path)
+    if not success:
+        return None
+    image_ref = res['preview_url']
+    pos = image_ref.find('file_preview')
+    if pos == -1:
+        return None
+    url = image_ref[:pos] + 'preview'
+
+    if cache is not None:
+        cache.put(course.id, digest, res['id'], url)
+    return url
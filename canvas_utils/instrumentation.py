@@ -0,0 +1,192 @@
+import json
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_ids = re.compile(r'/(?:\d+|sis_[a-z_]+_id:[^/]+)(?=/|$)')
+
+
+def normalize_endpoint(url):
+    """
+    Maps a request url to its endpoint, e.g. https://x/api/v1/courses/12/quizzes/3 -> courses/:id/quizzes/:id
+
+    :param url: url (str)
+    :return:    endpoint (str)
+    """
+    path = urlsplit(url).path
+    if '/api/v1/' in path:
+        path = path.split('/api/v1/', 1)[1]
+    return _ids.sub('/:id', '/' + path.strip('/'))[1:]
+
+
+class EndpointStats(object):
+    """
+    Counters and latency histogram of one method and endpoint
+    """
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.cached = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, status, bytes_sent, bytes_received, latency, from_cache):
+        self.count += 1
+        self.errors += status >= 400
+        self.cached += from_cache
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.histogram[i] += 1
+                break
+
+    def percentile(self, q):
+        """
+        :param q: quantile in [0, 1]
+        :return:  upper bound of the histogram bucket containing the quantile
+        """
+        rank = q * self.count
+        total = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.histogram):
+            total += n
+            if total >= rank and n:
+                return min(bound, self.max_latency)
+        return self.max_latency
+
+    def as_dict(self):
+        return dict(count=self.count, errors=self.errors, cached=self.cached, bytes_sent=self.bytes_sent,
+                    bytes_received=self.bytes_received, total_latency=self.latency,
+                    mean_latency=self.latency / self.count if self.count else 0.0, max_latency=self.max_latency,
+                    p50=self.percentile(0.5), p95=self.percentile(0.95),
+                    histogram=dict(zip([str(b) for b in LATENCY_BUCKETS], self.histogram)))
+
+
+class Instrumentation(object):
+    """
+    Records every HTTP request of a Canvas client (and of the courses and quizzes created through it).
+    Install it with Canvas.instrument(); without it no hook is registered and nothing is measured.
+
+    The latency is the time until the response headers arrived (requests' Response.elapsed).
+
+    :param trace: keep a trace of all requests for export_trace
+    """
+    def __init__(self, trace=False):
+        self.trace = [] if trace else None
+        self.callbacks = []
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+
+    def add_callback(self, callback):
+        """
+        Registers a function which is called with a dict (method, endpoint, url, status, bytes_sent,
+        bytes_received, latency, from_cache, start) for every request, e.g. to push metrics.
+        It runs in the thread which sent the request and should be quick.
+        """
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def hook(self, response, *args, **kwargs):
+        """
+        requests response hook
+        """
+        request = response.request
+        body = request.body
+        bytes_sent = len(body) if isinstance(body, (bytes, str)) else 0
+        length = response.headers.get('Content-Length')
+        bytes_received = int(length) if length is not None else len(response.content or b'')
+        latency = response.elapsed.total_seconds()
+        from_cache = getattr(response, 'from_cache', False)
+        endpoint = normalize_endpoint(request.url)
+        record = dict(method=request.method, endpoint=endpoint, url=request.url, status=response.status_code,
+                      bytes_sent=bytes_sent, bytes_received=bytes_received, latency=latency,
+                      from_cache=from_cache, start=time.time() - latency)
+
+        with self._lock:
+            key = (request.method, endpoint)
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.add(response.status_code, bytes_sent, bytes_received, latency, from_cache)
+            if self.trace is not None:
+                record['thread'] = threading.get_ident()
+                self.trace.append(record)
+
+        for callback in self.callbacks:
+            callback(record)
+        return response
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            if self.trace is not None:
+                self.trace = []
+            self._t0 = time.time()
+
+    def stats(self):
+        """
+        :return: dict 'METHOD endpoint' -> counters and latency statistics, plus key 'total'
+        """
+        with self._lock:
+            out = {'%s %s' % key: s.as_dict() for key, s in sorted(self.endpoints.items())}
+            total = EndpointStats()
+            for s in self.endpoints.values():
+                total.count += s.count
+                total.errors += s.errors
+                total.cached += s.cached
+                total.bytes_sent += s.bytes_sent
+                total.bytes_received += s.bytes_received
+                total.latency += s.latency
+                total.max_latency = max(total.max_latency, s.max_latency)
+                total.histogram = [a + b for a, b in zip(total.histogram, s.histogram)]
+        out['total'] = total.as_dict()
+        return out
+
+    def report(self):
+        """
+        :return: table of the requests per endpoint, sorted by total latency (str)
+        """
+        stats = self.stats()
+        total = stats.pop('total')
+        lines = ['%-55s %6s %5s %10s %8s %8s %8s' % ('endpoint', 'count', 'err', 'bytes in', 'total s', 'mean ms',
+                                                      'p95 ms')]
+        for name, s in sorted(stats.items(), key=lambda x: -x[1]['total_latency']):
+            lines.append('%-55s %6d %5d %10d %8.2f %8.1f %8.1f' % (
+                name[:55], s['count'], s['errors'], s['bytes_received'], s['total_latency'],
+                1000 * s['mean_latency'], 1000 * s['p95']))
+        lines.append('%-55s %6d %5d %10d %8.2f %8.1f %8.1f' % (
+            'total', total['count'], total['errors'], total['bytes_received'], total['total_latency'],
+            1000 * total['mean_latency'], 1000 * total['p95']))
+        return '\n'.join(lines)
+
+    def export_trace(self, path):
+        """
+        Writes the recorded requests in the Chrome trace event format (chrome://tracing, ui.perfetto.dev)
+
+        :param path: file name (str)
+        :return:     no of events written
+        """
+        if self.trace is None:
+            raise ValueError('Tracing is off, use Canvas.instrument(trace=True)')
+        with self._lock:
+            events = [dict(name='%s %s' % (r['method'], r['endpoint']), cat='http', ph='X', pid=1, tid=r['thread'],
+                           ts=int((r['start'] - self._t0) * 1e6), dur=int(r['latency'] * 1e6),
+                           args=dict(url=r['url'], status=r['status'], bytes_sent=r['bytes_sent'],
+                                     bytes_received=r['bytes_received'], from_cache=r['from_cache']))
+                      for r in self.trace]
+        with open(path, 'w') as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
+        return len(events)
@@ -0,0 +1,139 @@
+import collections
+import json
+import os
+import threading
+
+from .hashing import digest
+
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.expanduser('~'), '.canvasctl', 'journal')
+
+
+def payload_digest(payload):
+    """
+    :return: hash of a question payload without its position (str)
+    """
+    return digest({k: v for k, v in payload.items() if k != 'position'})
+
+
+class BuildJournal(object):
+    """
+    Append-only log of a quiz build. Every created quiz, group and question is written as one json
+    line (kind, key, id, hash) as soon as canvas confirmed it, and the line is flushed to disk. A
+    line cut off by a crash is ignored when the journal is read again; later lines for the same key
+    replace earlier ones.
+
+    Use it through CanvasCourse.create_quiz(..., journal='name').
+
+    :param path:  file name of the journal
+    :param fsync: sync every line to disk (survives OS crashes, not only crashes of python)
+    """
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.entries = {}
+        self._occurrences = collections.Counter()
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[(entry['kind'], entry['key'])] = entry
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            pass
+
+    def get(self, kind, key):
+        """
+        :return: journal entry (dict with keys kind, key, id, hash) or None
+        """
+        with self._lock:
+            return self.entries.get((kind, key))
+
+    def record(self, kind, key, id, hash=None):
+        """
+        Appends an entry and flushes it to disk
+        """
+        entry = dict(kind=kind, key=key, id=id, hash=hash)
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, 'a')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.entries[(kind, key)] = entry
+
+    def next_key(self, kind, name):
+        """
+        Key for the next group or question with this name within the build: the name itself, then
+        'name#2', 'name#3', ... for repeated names. Keys only depend on the order of the calls, so
+        a re-run of the same build gets the same keys.
+        """
+        with self._lock:
+            self._occurrences[(kind, name)] += 1
+            n = self._occurrences[(kind, name)]
+        return name if n == 1 else '%s#%d' % (name, n)
+
+    def questions(self):
+        return [e for (kind, _), e in self.entries.items() if kind == 'question']
+
+    def groups(self):
+        return [e for (kind, _), e in self.entries.items() if kind == 'group']
+
+    def verify(self, ids, kind='question'):
+        """
+        Forgets entries whose group or question no longer exists
+
+        :param ids:  ids of the existing groups or questions of the quiz (set)
+        :param kind: 'question' or 'group'
+        :return:     no of entries dropped
+        """
+        with self._lock:
+            gone = [k for k, e in self.entries.items() if k[0] == kind and e['id'] not in ids]
+            for k in gone:
+                del self.entries[k]
+        return len(gone)
+
+    def reset(self):
+        """
+        Clears the journal, e.g. after the quiz was deleted
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.entries = {}
+            self._occurrences.clear()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def open_journal(course_id, journal):
+    """
+    :param course_id: course id
+    :param journal:   BuildJournal, file name (ending in .jsonl) or name of a build; names are stored as
+                      ~/.canvasctl/journal/<course_id>_<name>.jsonl
+    :return:          BuildJournal
+    """
+    if isinstance(journal, BuildJournal):
+        return journal
+    if journal.endswith('.jsonl') or os.sep in journal:
+        return BuildJournal(journal)
+    return BuildJournal(os.path.join(DEFAULT_JOURNAL_DIR, '%s_%s.jsonl' % (course_id, journal)))
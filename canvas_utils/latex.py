@@ -1,9 +1,32 @@
+import re
 import urllib.parse as parse
+from functools import lru_cache
 
+
+_model = '<img class="equation_image" title="{0}" src="/equation_images/{1}" alt="Latex: {0}" data-equation-content="{0}" />'
+
+# $$...$$ (display) or $...$ (inline), a \$ is no delimiter
+_delimiters = re.compile(r'(?<!\\)\$\$(.+?)(?<!\\)\$\$|(?<!\\)\$(.+?)(?<!\\)\$', re.DOTALL)
+
+
+@lru_cache(maxsize=4096)
 def LaTeX2HTML(latex, inline=False):
     '''Converts Latex expression to canvas used <img> class.'''
-    model = '<img class="equation_image" title="{0}" src="/equation_images/{1}" alt="Latex: {0}" data-equation-content="{0}" />'
-    out = model.format(latex.replace('&amp;','&'),parse.quote(parse.quote(latex.replace('&amp;','&'), safe='()'), safe='()&'))
+    latex = latex.replace('&amp;','&')
+    out = _model.format(latex, parse.quote(parse.quote(latex, safe='()'), safe='()&'))
     if not inline:
         out = '</p>' + out + '</p>'
     return out
+
+
+def _replace(match):
+    if match.group(1) is not None:
+        return LaTeX2HTML(match.group(1).strip())
+    return LaTeX2HTML(match.group(2).strip(), inline=True)
+
+
+def render_latex(text):
+    '''Replaces all $...$ (inline) and $$...$$ (display) expressions in text by canvas equation images.'''
+    if not isinstance(text, str) or '$' not in text:
+        return text
+    return _delimiters.sub(_replace, text).replace('\\$', '$')
@@ -0,0 +1,317 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .archive import file_references
+from .hashing import digest
+from .paging import iter_items
+from .parallel import run_parallel
+
+
+DEFAULT_MIRROR_DB = os.path.join(os.path.expanduser('~'), '.canvasctl', 'mirror.sqlite')
+
+KINDS = ('folders', 'files', 'quizzes', 'modules', 'enrollments')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS folders (course_id INTEGER, id INTEGER, parent_folder_id INTEGER, full_name TEXT,
+    updated_at TEXT, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS files (course_id INTEGER, id INTEGER, folder_id INTEGER, display_name TEXT, size INTEGER,
+    content_type TEXT, created_at TEXT, updated_at TEXT, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS quizzes (course_id INTEGER, id INTEGER, title TEXT, published INTEGER,
+    question_count INTEGER, hash TEXT, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS questions (course_id INTEGER, id INTEGER, quiz_id INTEGER, name TEXT, type TEXT,
+    group_id INTEGER, position INTEGER, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS modules (course_id INTEGER, id INTEGER, name TEXT, position INTEGER, hash TEXT,
+    data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS module_items (course_id INTEGER, id INTEGER, module_id INTEGER, title TEXT, type TEXT,
+    content_id INTEGER, position INTEGER, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS enrollments (course_id INTEGER, id INTEGER, user_id INTEGER, type TEXT, state TEXT,
+    sortable_name TEXT, login_id TEXT, created_at TEXT, updated_at TEXT, data TEXT, PRIMARY KEY (course_id, id));
+CREATE TABLE IF NOT EXISTS file_refs (course_id INTEGER, file_id INTEGER, quiz_id INTEGER, question_id INTEGER);
+CREATE TABLE IF NOT EXISTS sync_state (course_id INTEGER, kind TEXT, cursor TEXT, synced_at REAL,
+    PRIMARY KEY (course_id, kind));
+CREATE INDEX IF NOT EXISTS files_folder ON files (course_id, folder_id);
+CREATE INDEX IF NOT EXISTS files_name ON files (course_id, display_name);
+CREATE INDEX IF NOT EXISTS questions_quiz ON questions (course_id, quiz_id);
+CREATE INDEX IF NOT EXISTS module_items_content ON module_items (course_id, type, content_id);
+CREATE INDEX IF NOT EXISTS enrollments_created ON enrollments (course_id, created_at);
+CREATE INDEX IF NOT EXISTS enrollments_user ON enrollments (course_id, user_id);
+CREATE INDEX IF NOT EXISTS file_refs_file ON file_refs (course_id, file_id);
+CREATE INDEX IF NOT EXISTS file_refs_question ON file_refs (course_id, question_id);
+'''
+
+
+class CourseMirror(object):
+    """
+    Local SQLite copy of the folders, files, quizzes (with questions), modules (with items) and
+    enrollments of a course. Use CanvasCourse.mirror() to open one.
+
+    sync() pulls only what changed since the last sync where canvas allows it:
+
+    - files are listed newest first (sort=updated_at) and the listing stops at the last sync
+    - the questions of all quizzes are listed concurrently (edits of questions do not show in the quiz
+      listing), only quizzes whose questions changed are written; module items are fetched only for
+      changed modules
+    - folders, quizzes, modules and enrollments are listed completely (one paginated listing each),
+      deleted objects are removed; only changed rows are written
+
+    Deleted files are found by sync(full=True) only.
+
+    All query methods run on the local database and never call canvas.
+
+    :param course:      CanvasCourse
+    :param path:        file name of the database (default ~/.canvasctl/mirror.sqlite)
+    :param max_workers: max. no of concurrent requests during sync
+    """
+    def __init__(self, course, path=None, max_workers=8):
+        self.course = course
+        self.course_id = course.id
+        self.path = path or DEFAULT_MIRROR_DB
+        self.max_workers = max_workers
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # ---- sync
+
+    def _list(self, endpoint, **kwargs):
+        return list(iter_items(self.course._requester, endpoint.format(self.course_id), prefetch=2, **kwargs))
+
+    def _cursor(self, kind):
+        row = self.db.execute('SELECT cursor FROM sync_state WHERE course_id=? AND kind=?',
+                              (self.course_id, kind)).fetchone()
+        return row[0] if row else None
+
+    def _set_cursor(self, kind, cursor):
+        self.db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                        (self.course_id, kind, cursor, time.time()))
+
+    def _replace_all(self, table, rows, ncols):
+        """
+        Writes the complete set of rows of a table; rows which did not change are not written
+        """
+        ids = set(r[1] for r in rows)
+        stored = dict(self.db.execute('SELECT id, data FROM %s WHERE course_id=?' % table, (self.course_id,)))
+        changed = [r for r in rows if stored.get(r[1]) != r[-1]]
+        gone = [(self.course_id, i) for i in stored if i not in ids]
+        self.db.executemany('INSERT OR REPLACE INTO %s VALUES (%s)' % (table, ', '.join('?' * ncols)), changed)
+        self.db.executemany('DELETE FROM %s WHERE course_id=? AND id=?' % table, gone)
+        return len(changed), len(gone)
+
+    def sync(self, kinds=KINDS, full=False):
+        """
+        Updates the mirror
+
+        :param kinds: subset of 'folders', 'files', 'quizzes', 'modules', 'enrollments'
+        :param full:  list everything again (finds deleted files, refetches all module items)
+        :return:      dict kind -> (no of changed rows, no of deleted rows)
+        """
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise ValueError('Unknown kinds: %s' % ', '.join(sorted(unknown)))
+        # the listings are independent and run concurrently, the database is written afterwards
+        results = run_parallel(lambda kind: getattr(self, '_fetch_' + kind)(full), kinds, self.max_workers)
+        summary = {}
+        with self._lock, self.db:
+            for kind, (fetched, error) in zip(kinds, results):
+                if error is not None:
+                    raise error
+                summary[kind] = getattr(self, '_store_' + kind)(fetched, full)
+        return summary
+
+    def _fetch_folders(self, full):
+        return self._list('courses/{}/folders')
+
+    def _store_folders(self, folders, full):
+        rows = [(self.course_id, f['id'], f.get('parent_folder_id'), f.get('full_name'), f.get('updated_at'),
+                 json.dumps(f, sort_keys=True)) for f in folders]
+        result = self._replace_all('folders', rows, 6)
+        self._set_cursor('folders', None)
+        return result
+
+    def _fetch_files(self, full):
+        cursor = None if full else self._cursor('files')
+        files = []
+        for f in iter_items(self.course._requester, 'courses/{}/files'.format(self.course_id), prefetch=2,
+                            sort='updated_at', order='desc'):
+            if cursor is not None and f.get('updated_at') is not None and f['updated_at'] < cursor:
+                break
+            files.append(f)
+        return files
+
+    def _store_files(self, files, full):
+        rows = [(self.course_id, f['id'], f.get('folder_id'), f.get('display_name'), f.get('size'),
+                 f.get('content-type'), f.get('created_at'), f.get('updated_at'), json.dumps(f, sort_keys=True))
+                for f in files]
+        if full:
+            result = self._replace_all('files', rows, 9)
+        else:
+            # files updated in the same second as the cursor are listed again, only write real changes
+            stored = dict(self.db.execute('SELECT id, data FROM files WHERE course_id=?', (self.course_id,)))
+            rows = [r for r in rows if stored.get(r[1]) != r[-1]]
+            self.db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            result = (len(rows), 0)
+        stamps = [f['updated_at'] for f in files if f.get('updated_at')]
+        if stamps:
+            self._set_cursor('files', max(stamps + [self._cursor('files') or '']))
+        return result
+
+    def _fetch_quizzes(self, full):
+        # edited questions do not change the quiz listing, so the questions of every quiz are listed
+        quizzes = self._list('courses/{}/quizzes')
+        endpoint = 'courses/{}/quizzes/%s/questions'
+        results = run_parallel(lambda q: self._list(endpoint % q['id']), quizzes, self.max_workers)
+        questions = {}
+        for q, (items, error) in zip(quizzes, results):
+            if error is not None:
+                raise error
+            questions[q['id']] = items
+        return quizzes, questions
+
+    def _store_quizzes(self, fetched, full):
+        quizzes, questions = fetched
+        rows = [(self.course_id, q['id'], q.get('title'), int(bool(q.get('published'))), q.get('question_count'),
+                 digest(q), json.dumps(q, sort_keys=True)) for q in quizzes]
+        result = self._replace_all('quizzes', rows, 7)
+        ids = set(q['id'] for q in quizzes)
+        gone = [(self.course_id, i) for (i,) in self.db.execute(
+            'SELECT DISTINCT quiz_id FROM questions WHERE course_id=?', (self.course_id,)) if i not in ids]
+        for quiz_id, items in list(questions.items()) + [(i, []) for _, i in gone]:
+            stored = dict(self.db.execute('SELECT id, data FROM questions WHERE course_id=? AND quiz_id=?',
+                                          (self.course_id, quiz_id)))
+            if not full and stored == {q['id']: json.dumps(q, sort_keys=True) for q in items}:
+                continue
+            self.db.execute('DELETE FROM questions WHERE course_id=? AND quiz_id=?', (self.course_id, quiz_id))
+            self.db.execute('DELETE FROM file_refs WHERE course_id=? AND quiz_id=?', (self.course_id, quiz_id))
+            self.db.executemany('INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+                (self.course_id, q['id'], quiz_id, q.get('question_name'), q.get('question_type'),
+                 q.get('quiz_group_id'), q.get('position'), json.dumps(q, sort_keys=True)) for q in items])
+            self.db.executemany('INSERT INTO file_refs VALUES (?, ?, ?, ?)', [
+                (self.course_id, file_id, quiz_id, q['id']) for q in items for file_id in file_references(q)])
+        return result
+
+    def _fetch_modules(self, full):
+        modules = self._list('courses/{}/modules')
+        stored = dict(self.db.execute('SELECT id, hash FROM modules WHERE course_id=?', (self.course_id,)))
+        changed = [m for m in modules if full or stored.get(m['id']) != digest(m)]
+        endpoint = 'courses/{}/modules/%s/items'
+        results = run_parallel(lambda m: self._list(endpoint % m['id']), changed, self.max_workers)
+        items = {}
+        for m, (module_items, error) in zip(changed, results):
+            if error is not None:
+                raise error
+            items[m['id']] = module_items
+        return modules, items
+
+    def _store_modules(self, fetched, full):
+        modules, items = fetched
+        rows = [(self.course_id, m['id'], m.get('name'), m.get('position'), digest(m), json.dumps(m, sort_keys=True))
+                for m in modules]
+        result = self._replace_all('modules', rows, 6)
+        ids = set(m['id'] for m in modules)
+        gone = [i for (i,) in self.db.execute('SELECT DISTINCT module_id FROM module_items WHERE course_id=?',
+                                              (self.course_id,)) if i not in ids]
+        for module_id, module_items in list(items.items()) + [(i, []) for i in gone]:
+            self.db.execute('DELETE FROM module_items WHERE course_id=? AND module_id=?', (self.course_id, module_id))
+            self.db.executemany('INSERT OR REPLACE INTO module_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+                (self.course_id, i['id'], module_id, i.get('title'), i.get('type'), i.get('content_id'),
+                 i.get('position'), json.dumps(i, sort_keys=True)) for i in module_items])
+        return result
+
+    def _fetch_enrollments(self, full):
+        return self._list('courses/{}/enrollments')
+
+    def _store_enrollments(self, enrollments, full):
+        rows = []
+        for e in enrollments:
+            user = e.get('user') or {}
+            rows.append((self.course_id, e['id'], e.get('user_id'), e.get('type'), e.get('enrollment_state'),
+                         user.get('sortable_name'), user.get('login_id'), e.get('created_at'), e.get('updated_at'),
+                         json.dumps(e, sort_keys=True)))
+        return self._replace_all('enrollments', rows, 10)
+
+    # ---- queries
+
+    def query(self, sql, params=()):
+        """
+        Runs a SQL query on the mirror. All tables have a column course_id.
+
+        :return: list of sqlite3.Row
+        """
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def last_sync(self):
+        """
+        :return: dict kind -> time of the last sync (epoch seconds)
+        """
+        return {kind: t for kind, t in self.query('SELECT kind, synced_at FROM sync_state WHERE course_id=?',
+                                                  (self.course_id,))}
+
+    def count(self, table):
+        if table not in KINDS + ('questions', 'module_items'):
+            raise ValueError('Unknown table %s' % table)
+        return self.query('SELECT COUNT(*) FROM %s WHERE course_id=?' % table, (self.course_id,))[0][0]
+
+    def quizzes_using_file(self, file_id):
+        """
+        :return: list of rows (quiz_id, title, questions) of the quizzes whose questions show the file
+        """
+        return self.query('SELECT r.quiz_id, q.title, COUNT(*) AS questions FROM file_refs r '
+                          'LEFT JOIN quizzes q ON q.course_id=r.course_id AND q.id=r.quiz_id '
+                          'WHERE r.course_id=? AND r.file_id=? GROUP BY r.quiz_id', (self.course_id, file_id))
+
+    def enrolled_since(self, since, type='StudentEnrollment'):
+        """
+        :param since: ISO date or timestamp (str), e.g. '2024-10-07'
+        :param type:  enrollment type (None: all)
+        :return:      list of enrollment rows created at or after since
+        """
+        sql = 'SELECT * FROM enrollments WHERE course_id=? AND created_at>=?'
+        params = [self.course_id, since]
+        if type is not None:
+            sql += ' AND type=?'
+            params.append(type)
+        return self.query(sql + ' ORDER BY created_at', params)
+
+    def orphaned_files(self):
+        """
+        :return: list of file rows which are neither shown in a quiz question nor linked from a module
+        """
+        return self.query('SELECT * FROM files f WHERE f.course_id=? '
+                          'AND NOT EXISTS (SELECT 1 FROM file_refs r WHERE r.course_id=f.course_id AND r.file_id=f.id) '
+                          'AND NOT EXISTS (SELECT 1 FROM module_items i WHERE i.course_id=f.course_id '
+                          "AND i.type='File' AND i.content_id=f.id) ORDER BY f.display_name", (self.course_id,))
+
+    def files_in_folder(self, full_name):
+        """
+        :param full_name: folder path, e.g. 'course files/Images'
+        :return:          list of file rows
+        """
+        return self.query('SELECT f.* FROM files f JOIN folders d ON d.course_id=f.course_id AND d.id=f.folder_id '
+                          'WHERE f.course_id=? AND d.full_name=? ORDER BY f.display_name', (self.course_id, full_name))
+
+    def find_questions(self, text):
+        """
+        :param text: text searched in question names and texts
+        :return:     list of question rows
+        """
+        pattern = '%' + text + '%'
+        return self.query("SELECT * FROM questions WHERE course_id=? AND (name LIKE ? OR "
+                          "json_extract(data, '$.question_text') LIKE ?)", (self.course_id, pattern, pattern))
@@ -0,0 +1,89 @@
+import queue
+import threading
+
+from canvasapi.util import combine_kwargs
+
+
+MAX_PER_PAGE = 100
+
+_done = object()
+
+
+def iter_pages(requester, endpoint, per_page=MAX_PER_PAGE, prefetch=0, key=None, **kwargs):
+    """
+    Walks a paginated canvas listing page by page. Unlike canvasapi's PaginatedList nothing is kept
+    after a page was consumed.
+
+    With prefetch > 0 the pages are fetched on a background thread up to prefetch pages ahead, so the
+    next page is on its way while the current one is processed. Closing the generator early (e.g.
+    by leaving a for loop with break) stops the background thread after its current request.
+
+    :param requester: canvasapi requester
+    :param endpoint:  endpoint of the listing, e.g. 'courses/1/users'
+    :param per_page:  page size (canvas caps it at 100 for most endpoints)
+    :param prefetch:  no of pages fetched ahead (0: fetch each page when it is needed)
+    :param key:       key of the list in wrapped responses, e.g. 'quiz_submissions'
+    :param kwargs:    query parameters
+    :return:          generator of pages (list of dict)
+    """
+    if prefetch > 0:
+        return _prefetch(_iter_pages(requester, endpoint, per_page, key, **kwargs), prefetch)
+    return _iter_pages(requester, endpoint, per_page, key, **kwargs)
+
+
+def _prefetch(pages, depth):
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+            put((_done, None))
+        except Exception as e:
+            put((None, e))
+        finally:
+            pages.close()
+
+    threading.Thread(target=fetch, name='canvas_utils-prefetch', daemon=True).start()
+    try:
+        while True:
+            page, error = buffer.get()
+            if error is not None:
+                raise error
+            if page is _done:
+                return
+            yield page
+    finally:
+        stop.set()
+
+
+def _iter_pages(requester, endpoint, per_page, key, **kwargs):
+    kwargs['per_page'] = per_page
+    response = requester.request('GET', endpoint, _kwargs=combine_kwargs(**kwargs))
+    while True:
+        page = response.json()
+        yield page if key is None else page[key]
+        next_link = response.links.get('next')
+        if not next_link:
+            return
+        response = requester.request('GET', _url=next_link['url'])
+
+
+def iter_items(requester, endpoint, per_page=MAX_PER_PAGE, prefetch=0, key=None, **kwargs):
+    """
+    Like iter_pages, but yields the single items (dict)
+    """
+    for page in iter_pages(requester, endpoint, per_page=per_page, prefetch=prefetch, key=key, **kwargs):
+        for item in page:
+            yield item
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_parallel(func, items, max_workers=8):
+    """
+    Calls func for each item through a bounded thread pool.
+
+    :param func:        callable taking one item
+    :param items:       iterable of items
+    :param max_workers: max. no of concurrent calls
+    :return:            list of (result, exception) tuples in the order of items. exception is None on success
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    if max_workers is None or max_workers <= 1 or len(items) == 1:
+        return [call(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(call, items))
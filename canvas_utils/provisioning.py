@@ -0,0 +1,220 @@
+import threading
+
+from canvasapi.util import combine_kwargs
+
+from .paging import iter_items
+from .parallel import run_parallel
+
+
+ROOT_FOLDER = 'course files'
+
+
+class FolderIndex(object):
+    """
+    Folders of a course by path relative to the root folder ('' is the root, 'Lectures/Week 1' a
+    subfolder). Built from one folder listing and kept up to date with the folders created through it.
+    """
+    def __init__(self, folders):
+        self._folders = {}
+        self._lock = threading.Lock()
+        for f in folders:
+            self.add(f)
+
+    @classmethod
+    def load(cls, course, per_page=100, prefetch=2):
+        """
+        :param course: CanvasCourse
+        :return:       FolderIndex of all folders of the course
+        """
+        return cls(iter_items(course._requester, 'courses/{}/folders'.format(course.id), per_page=per_page,
+                              prefetch=prefetch))
+
+    def add(self, folder):
+        """
+        :param folder: folder attributes (dict) as returned by canvas
+        """
+        full_name = folder['full_name']
+        path = '' if full_name == ROOT_FOLDER else full_name[len(ROOT_FOLDER) + 1:]
+        with self._lock:
+            self._folders[path] = folder
+
+    def get(self, path):
+        """
+        :param path: folder path, e.g. 'Lectures/Week 1'
+        :return:     folder attributes (dict) or None
+        """
+        with self._lock:
+            return self._folders.get(normalize_path(path))
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __len__(self):
+        return len(self._folders)
+
+
+class ProvisionSummary(object):
+    """
+    Result of CanvasCourse.provision. created and existing are lists of node names like
+    'folder:Lectures/Week 1', 'module:Week 1' or 'item:Week 1/Slides'; failed is a dict name -> exception.
+    """
+    def __init__(self):
+        self.created = []
+        self.existing = []
+        self.failed = {}
+        self._lock = threading.Lock()
+
+    def add(self, node, created):
+        with self._lock:
+            (self.created if created else self.existing).append(node)
+
+    def fail(self, node, error):
+        with self._lock:
+            self.failed[node] = error
+
+    def __str__(self):
+        return '%d created, %d existing, %d failed' % (len(self.created), len(self.existing), len(self.failed))
+
+    def __repr__(self):
+        return '<ProvisionSummary: %s>' % self
+
+
+def normalize_path(path):
+    return '/'.join(p for p in path.strip().split('/') if p)
+
+
+def folder_paths(folders, prefix=''):
+    """
+    :param folders: list of paths ('Lectures/Week 1') or nested dict {'Lectures': {'Week 1': {}}}
+    :return:        list of all folder paths including the parents, parents first
+    """
+    paths = []
+    if isinstance(folders, str):
+        folders = [folders]
+    if isinstance(folders, dict):
+        for name, sub in folders.items():
+            path = normalize_path(prefix + '/' + name)
+            paths.append(path)
+            paths += folder_paths(sub or {}, path)
+    else:
+        for f in folders:
+            if isinstance(f, dict):
+                paths += folder_paths(f, prefix)
+                continue
+            parts = normalize_path(prefix + '/' + f).split('/')
+            paths += ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+    seen = set()
+    return [p for p in paths if p and not (p in seen or seen.add(p))]
+
+
+def provision_folders(course, folders, index, summary, max_workers=8):
+    """
+    Creates the missing folders level by level; the folders of one level are created concurrently
+    """
+    requester = course._requester
+    paths = folder_paths(folders)
+    levels = {}
+    for path in paths:
+        levels.setdefault(path.count('/'), []).append(path)
+
+    def create(path):
+        parent_path, _, name = path.rpartition('/')
+        parent = index.get(parent_path)
+        if parent is None:
+            raise ValueError('Parent folder of %s was not created' % path)
+        response = requester.request('POST', 'folders/{}/folders'.format(parent['id']),
+                                     _kwargs=combine_kwargs(name=name))
+        index.add(response.json())
+
+    for depth in sorted(levels):
+        todo = []
+        for path in levels[depth]:
+            if path in index:
+                summary.add('folder:' + path, False)
+            else:
+                todo.append(path)
+        for path, (_, error) in zip(todo, run_parallel(create, todo, max_workers)):
+            if error is None:
+                summary.add('folder:' + path, True)
+            else:
+                summary.fail('folder:' + path, error)
+
+
+def provision_modules(course, modules, summary, max_workers=8):
+    """
+    Creates the missing modules concurrently, then the missing items of all modules; the items of one
+    module are created in order, different modules concurrently
+    """
+    requester = course._requester
+    base = 'courses/{}/modules'.format(course.id)
+    existing = {}
+    for m in iter_items(requester, base):
+        existing.setdefault(m['name'], m)
+
+    specs = [dict(m) for m in modules]
+    todo = [(position, m) for position, m in enumerate(specs, start=1) if m['name'] not in existing]
+    for m in specs:
+        if m['name'] in existing:
+            summary.add('module:' + m['name'], False)
+
+    def create(item):
+        position, m = item
+        attributes = {k: v for k, v in m.items() if k != 'items'}
+        attributes.setdefault('position', position)
+        return requester.request('POST', base, _kwargs=combine_kwargs(module=attributes)).json()
+
+    created = {}
+    for (_, m), (module, error) in zip(todo, run_parallel(create, todo, max_workers)):
+        if error is None:
+            created[m['name']] = module
+            summary.add('module:' + m['name'], True)
+        else:
+            summary.fail('module:' + m['name'], error)
+
+    def fill(m):
+        if m['name'] in created:
+            module, items = created[m['name']], []
+        else:
+            module = existing[m['name']]
+            items = list(iter_items(requester, '{}/{}/items'.format(base, module['id'])))
+        present = set((i.get('title'), i.get('type')) for i in items)
+        for position, item in enumerate(m.get('items', []), start=1):
+            node = 'item:%s/%s' % (m['name'], item.get('title'))
+            if (item.get('title'), item.get('type')) in present:
+                summary.add(node, False)
+                continue
+            item = dict(item)
+            item.setdefault('position', position)
+            try:
+                requester.request('POST', '{}/{}/items'.format(base, module['id']),
+                                  _kwargs=combine_kwargs(module_item=item))
+                summary.add(node, True)
+            except Exception as e:
+                summary.fail(node, e)
+
+    filled = [m for m in specs if m.get('items') and m['name'] in set(existing) | set(created)]
+    for m, (_, error) in zip(filled, run_parallel(fill, filled, max_workers)):
+        # e.g. the item listing of an existing module failed
+        if error is not None:
+            summary.fail('items:' + m['name'], error)
+
+
+def provision(course, layout, max_workers=8, index=None):
+    """
+    Creates folders, modules and module items of a layout. See CanvasCourse.provision.
+    """
+    summary = ProvisionSummary()
+    tasks = []
+    if layout.get('folders'):
+        def folders():
+            folder_index = index if index is not None else FolderIndex.load(course)
+            provision_folders(course, layout['folders'], folder_index, summary, max_workers)
+        tasks.append(('folders', folders))
+    if layout.get('modules'):
+        tasks.append(('modules', lambda: provision_modules(course, layout['modules'], summary, max_workers)))
+
+    # folders and modules do not depend on each other
+    for (name, _), (_, error) in zip(tasks, run_parallel(lambda task: task[1](), tasks, 2)):
+        if error is not None:
+            summary.fail(name, error)
+    return summary
@@ -0,0 +1,83 @@
+class QuestionSpec(object):
+    """
+    Question to be sent to canvas, shared by all question types. Only the fields a question needs are
+    stored; the payload dict is built when the question is sent and leaves out empty values, so canvas
+    uses its defaults for them.
+
+    :param name:     question title
+    :param type:     canvas question type, e.g. 'multiple_choice_question'
+    :param text:     question text (html)
+    :param points:   no of points (None: canvas default)
+    :param answers:  list of answer dicts as expected by canvas
+    :param group_id: id of the question group
+    :param position: position in the quiz
+    :param key:      key identifying the question (default: name)
+    :param extra:    further payload fields (dict), e.g. comments
+    """
+    __slots__ = ('name', 'type', 'text', 'points', 'answers', 'group_id', 'position', 'key', 'extra')
+
+    # payload field -> attribute
+    FIELDS = (('question_name', 'name'), ('question_type', 'type'), ('question_text', 'text'),
+              ('points_possible', 'points'), ('answers', 'answers'), ('quiz_group_id', 'group_id'),
+              ('position', 'position'))
+
+    def __init__(self, name, type, text, points=None, answers=None, group_id=None, position=None, key=None,
+                 extra=None):
+        self.name = name
+        self.type = type
+        self.text = text
+        self.points = points
+        self.answers = answers or []
+        self.group_id = group_id
+        self.position = position
+        self.key = key
+        self.extra = extra or None
+
+    @classmethod
+    def from_payload(cls, payload):
+        """
+        :param payload: question payload (dict) with canvas field names
+        :return:        QuestionSpec
+        """
+        payload = dict(payload)
+        kwargs = {attr: payload.pop(field, None) for field, attr in cls.FIELDS}
+        return cls(extra={k: v for k, v in payload.items() if not _empty(v)}, **kwargs)
+
+    @classmethod
+    def coerce(cls, question):
+        return question if isinstance(question, cls) else cls.from_payload(question)
+
+    def payload(self):
+        """
+        :return: question payload (dict) without empty fields
+        """
+        payload = {field: getattr(self, attr) for field, attr in self.FIELDS if not _empty(getattr(self, attr))}
+        if self.extra:
+            payload.update((k, v) for k, v in self.extra.items() if not _empty(v))
+        return payload
+
+    def __repr__(self):
+        return '<QuestionSpec %s: %s>' % (self.type, self.name)
+
+
+class QuestionRef(object):
+    """
+    What a CanvasQuiz keeps of a created question
+
+    :param id:       canvas id of the question
+    :param key:      key of the question (see QuestionSpec)
+    :param position: position in the quiz
+    """
+    __slots__ = ('id', 'key', 'position')
+
+    def __init__(self, id, key=None, position=None):
+        self.id = id
+        self.key = key
+        self.position = position
+
+    def __repr__(self):
+        return '<QuestionRef %s: %s>' % (self.id, self.key)
+
+
+def _empty(value):
+    return value is None or value == '' or value == [] or value == {}
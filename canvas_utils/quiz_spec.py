@@ -0,0 +1,308 @@
+import json
+import os
+
+from canvasapi.exceptions import ResourceDoesNotExist
+from canvasapi.util import combine_kwargs
+
+from .journal import payload_digest
+from .parallel import run_parallel
+
+
+QUESTION_TYPES = ('mc', 'multi_answer', 'numerical', 'essay', 'file_upload', 'short_answer', 'true_false',
+                  'text_only', 'fill_blanks')
+
+
+class QuizSpec(object):
+    """
+    Declarative definition of a quiz.
+
+    quiz:      quiz settings, keyword arguments for CanvasCourse.create_quiz (dict); sync applies changed ones
+    groups:    list of dicts with keys 'key', 'name', 'pick_count', 'points'
+    questions: list of dicts with keys 'key', 'type' (see QUESTION_TYPES), optional 'group' (key of a group)
+               and the keyword arguments of the matching CanvasQuiz.new_*_question method
+
+    Example (yaml):
+
+        quiz:
+          title: Exam 1
+        groups:
+          - key: g1
+            name: Derivatives
+            pick_count: 1
+            points: 2
+        questions:
+          - key: intro
+            type: text_only
+            title: Intro
+            text: Answer all questions.
+          - key: d1
+            type: numerical
+            group: g1
+            title: d/dx x^2 at x=3
+            text: ...
+            answer: 6
+            errorMargin: 0.01
+    """
+    def __init__(self, quiz=None, groups=None, questions=None):
+        self.quiz = dict(quiz or {})
+        self.groups = [dict(g) for g in groups or []]
+        self.questions = [dict(q) for q in questions or []]
+        self.validate()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('quiz'), data.get('groups'), data.get('questions'))
+
+    def validate(self):
+        group_keys = set()
+        for g in self.groups:
+            if 'key' not in g:
+                raise ValueError('Group without key: %r' % g)
+            if g['key'] in group_keys:
+                raise ValueError('Duplicate group key %r' % g['key'])
+            group_keys.add(g['key'])
+
+        keys = set()
+        for q in self.questions:
+            key = q.get('key')
+            if key is None:
+                raise ValueError('Question without key: %r' % q.get('title'))
+            if key in keys:
+                raise ValueError('Duplicate question key %r' % key)
+            keys.add(key)
+            if q.get('type') not in QUESTION_TYPES:
+                raise ValueError('Question %r: unknown type %r' % (key, q.get('type')))
+            if q.get('group') is not None and q['group'] not in group_keys:
+                raise ValueError('Question %r: unknown group %r' % (key, q['group']))
+
+
+def load_quiz_spec(path):
+    """
+    Reads a quiz definition from a yaml (.yaml, .yml, needs PyYAML) or json file
+
+    :param path: file name (str)
+    :return:     QuizSpec
+    """
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('Reading yaml quiz specs requires PyYAML (pip install pyyaml)')
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return QuizSpec.from_dict(data or {})
+
+
+def _state_file(quiz):
+    return os.path.join(os.path.expanduser('~'), '.canvasctl', 'sync', '%s_%s.json' % (quiz.course_id, quiz.id))
+
+
+class SyncSummary(object):
+    """
+    Result of CanvasQuiz.sync. Each attribute is a list of keys, failed is a dict key -> exception.
+    moved are unchanged questions which only got a new position, settings the changed quiz settings.
+    """
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = []
+        self.moved = []
+        self.settings = []
+        self.failed = {}
+
+    def __str__(self):
+        return '%d created, %d updated, %d deleted, %d unchanged, %d failed' % (
+            len(self.created), len(self.updated), len(self.deleted), len(self.unchanged), len(self.failed))
+
+    def __repr__(self):
+        return '<SyncSummary: %s>' % self
+
+
+def _group(data):
+    return data['quiz_groups'][0] if 'quiz_groups' in data else data
+
+
+def sync_quiz(quiz, spec, state_file=None, prune=True, max_workers=8):
+    """
+    Brings the settings, groups and questions of a quiz in line with a QuizSpec. See CanvasQuiz.sync.
+    """
+    if not isinstance(spec, QuizSpec):
+        spec = load_quiz_spec(spec) if isinstance(spec, str) else QuizSpec.from_dict(spec)
+    state_file = state_file or _state_file(quiz)
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    old_groups = state.get('groups', {})
+    old_questions = state.get('questions', {})
+    new_state = dict(groups={}, questions={})
+    summary = SyncSummary()
+    requester = quiz._requester
+    base = 'courses/{}/quizzes/{}'.format(quiz.course_id, quiz.id)
+
+    # settings
+    settings = {k: v for k, v in spec.quiz.items() if getattr(quiz, k, None) != v}
+    if settings:
+        quiz.edit(quiz=settings)
+        for k, v in settings.items():
+            setattr(quiz, k, v)
+        summary.settings = sorted(settings)
+
+    # remote groups: the groups of the listed questions and of the state file. Canvas has no group listing,
+    # so they are fetched one by one (concurrently); a group missing in canvas is dropped.
+    remote = {q.id: q for q in quiz.get_questions()}
+    group_ids = sorted(set(getattr(q, 'quiz_group_id', None) for q in remote.values()) - {None} |
+                       set(old['id'] for old in old_groups.values()))
+
+    def fetch_group(group_id):
+        try:
+            return _group(requester.request('GET', '{}/groups/{}'.format(base, group_id)).json())
+        except ResourceDoesNotExist:
+            return None
+
+    remote_groups = {}
+    for group_id, (group, error) in zip(group_ids, run_parallel(fetch_group, group_ids, max_workers)):
+        if error is not None:
+            raise error
+        if group is not None:
+            remote_groups[group_id] = group
+
+    # groups
+    claimed_groups = set(old['id'] for old in old_groups.values() if old['id'] in remote_groups)
+    for g in spec.groups:
+        payload = dict(name=g.get('name', ''), pick_count=g.get('pick_count', 1), question_points=g.get('points', 0))
+        digest = payload_digest(payload)
+        old = old_groups.get(g['key'])
+        group_id = old['id'] if old is not None and old['id'] in remote_groups else None
+        if group_id is None:
+            # no (valid) state entry, e.g. state file lost: match by name
+            old = None
+            candidates = [i for i, r in sorted(remote_groups.items())
+                          if r.get('name') == payload['name'] and i not in claimed_groups]
+            if candidates:
+                group_id = candidates[0]
+                claimed_groups.add(group_id)
+        if group_id is not None:
+            if old is not None:
+                changed = old['hash'] != digest
+            else:
+                changed = any(str(remote_groups[group_id].get(k)) != str(v) for k, v in payload.items())
+            if changed:
+                requester.request('PUT', '{}/groups/{}'.format(base, group_id),
+                                  _kwargs=combine_kwargs(quiz_groups=[payload]))
+        else:
+            group_id = quiz.create_question_group([payload]).id
+        new_state['groups'][g['key']] = dict(id=group_id, hash=digest)
+
+    # questions
+    by_name = {}
+    for q in remote.values():
+        by_name.setdefault(q.question_name, []).append(q.id)
+    claimed = set(old['id'] for old in old_questions.values() if old['id'] in remote)
+
+    todo = []
+    order = []
+    for position, q in enumerate(spec.questions, start=1):
+        kwargs = {k: v for k, v in q.items() if k not in ('key', 'group')}
+        payload = quiz.build_question(kwargs)
+        payload['position'] = position
+        if q.get('group') is not None:
+            payload['quiz_group_id'] = new_state['groups'][q['group']]['id']
+        # the position is not part of the hash, moved questions are reordered below without an update
+        digest = payload_digest(payload)
+
+        old = old_questions.get(q['key'])
+        question_id = old['id'] if old is not None and old['id'] in remote else None
+        if question_id is None:
+            candidates = [i for i in by_name.get(payload['question_name'], []) if i not in claimed]
+            if candidates:
+                question_id = candidates[0]
+                claimed.add(question_id)
+                old = None
+
+        if question_id is not None and old is not None and old['hash'] == digest:
+            summary.unchanged.append(q['key'])
+            new_state['questions'][q['key']] = dict(id=question_id, hash=digest)
+        else:
+            todo.append((q['key'], question_id, payload, digest))
+        order.append((q['key'], payload.get('quiz_group_id'), question_id))
+
+    def send(item):
+        key, question_id, payload, digest = item
+        if question_id is None:
+            response = requester.request('POST', '{}/questions'.format(base),
+                                         _kwargs=combine_kwargs(question=payload))
+        else:
+            response = requester.request('PUT', '{}/questions/{}'.format(base, question_id),
+                                         _kwargs=combine_kwargs(question=payload))
+        return response.json()['id']
+
+    for (key, question_id, payload, digest), (new_id, error) in zip(todo, run_parallel(send, todo, max_workers)):
+        if error is not None:
+            summary.failed[key] = error
+            if question_id is not None:
+                claimed.add(question_id)
+                new_state['questions'][key] = dict(id=question_id, hash=None)
+            continue
+        (summary.created if question_id is None else summary.updated).append(key)
+        new_state['questions'][key] = dict(id=new_id, hash=digest)
+
+    # deletions
+    if prune:
+        keep = set(v['id'] for v in new_state['questions'].values())
+        obsolete = [i for i in remote if i not in keep]
+        names = {v['id']: k for k, v in old_questions.items()}
+
+        def delete(question_id):
+            requester.request('DELETE', '{}/questions/{}'.format(base, question_id))
+
+        for question_id, (_, error) in zip(obsolete, run_parallel(delete, obsolete, max_workers)):
+            key = names.get(question_id, question_id)
+            if error is None or isinstance(error, ResourceDoesNotExist):
+                summary.deleted.append(key)
+            else:
+                summary.failed[key] = error
+
+        keep_groups = set(v['id'] for v in new_state['groups'].values())
+        for group_id in remote_groups:
+            if group_id not in keep_groups:
+                try:
+                    requester.request('DELETE', '{}/groups/{}'.format(base, group_id))
+                except ResourceDoesNotExist:
+                    pass
+    else:
+        for key, old in old_groups.items():
+            new_state['groups'].setdefault(key, old)
+
+    # positions: one reorder request, if questions were added or the existing ones are out of order
+    existing = [question_id for _, _, question_id in order if question_id is not None]
+    remote_order = sorted(existing, key=lambda i: (getattr(remote[i], 'position', None) or 0, i))
+    if summary.created or existing != remote_order:
+        items = []
+        for key, group_id, _ in order:
+            if group_id is not None:
+                item = dict(id=group_id, type='group')
+            elif key in new_state['questions']:
+                item = dict(id=new_state['questions'][key]['id'], type='question')
+            else:
+                continue
+            if item not in items:
+                items.append(item)
+        requester.request('POST', '{}/reorder'.format(base), _kwargs=combine_kwargs(order=items))
+        summary.moved = [key for key, _, question_id in order if key in summary.unchanged and
+                         existing.index(question_id) != remote_order.index(question_id)]
+
+    # canvas shows changed questions of a published quiz to students only after the quiz was saved again
+    if getattr(quiz, 'published', False) and (summary.created or summary.updated or summary.deleted):
+        quiz.edit(quiz=dict(published=True))
+
+    directory = os.path.dirname(state_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(state_file, 'w') as f:
+        json.dump(new_state, f, indent=1)
+    return summary
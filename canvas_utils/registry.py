@@ -0,0 +1,93 @@
+import threading
+
+from .c_Canvas import Canvas
+from .config import load_config, site_config, validate_config
+from .parallel import run_parallel
+from .transport import Transport
+
+
+class CanvasRegistry(object):
+    """
+    Hands out one Canvas client per section of canvas.conf. The config file is parsed once, the
+    clients are created on first use, cached and shared between threads. Each client has a pooled,
+    retrying Transport; sections with the same url and token share their client.
+
+        registry = CanvasRegistry()
+        htw = registry.get('Sites.HTW')
+        results = registry.run_all(lambda canvas, section: len(list(canvas.get_courses())))
+
+    :param path:      file name of canvas.conf (default ~/.canvasctl/canvas.conf)
+    :param transport: Transport used for new clients (default: Transport())
+    :param strict:    raise ValueError if any section of the config file is invalid
+    :param kwargs:    further arguments for Canvas, e.g. cache
+    """
+    def __init__(self, path=None, transport=None, strict=False, **kwargs):
+        self.path = path
+        self.transport = transport if transport is not None else Transport()
+        self.kwargs = kwargs
+        self.problems = validate_config(path)
+        if strict and self.problems:
+            raise ValueError('Invalid sections in canvas.conf: ' +
+                             '; '.join('[%s] %s' % (s, ', '.join(p)) for s, p in sorted(self.problems.items())))
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def sections(self):
+        """
+        :return: list of all valid sections
+        """
+        return [s for s in load_config(self.path) if s not in self.problems]
+
+    def get(self, section='Default'):
+        """
+        :param section: section of canvas.conf
+        :return:        Canvas
+        """
+        if section in self.problems:
+            raise ValueError('[%s] %s' % (section, ', '.join(self.problems[section])))
+        url, token = site_config(section, self.path)
+        with self._lock:
+            client = self._clients.get((url, token))
+            if client is None:
+                client = Canvas(url, token, transport=self.transport, **self.kwargs)
+                self._clients[(url, token)] = client
+            return client
+
+    def __getitem__(self, section):
+        return self.get(section)
+
+    def run_all(self, func, sections=None, max_workers=8):
+        """
+        Calls func(canvas, section) for several sites concurrently
+
+        :param func:        callable (Canvas, section) -> result
+        :param sections:    list of sections (default: all valid sections)
+        :param max_workers: max. no of sites processed at the same time
+        :return:            dict section -> (result, exception); exception is None on success
+        """
+        sections = self.sections() if sections is None else list(sections)
+        results = run_parallel(lambda s: func(self.get(s), s), sections, max_workers)
+        return dict(zip(sections, results))
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    :return: the CanvasRegistry of ~/.canvasctl/canvas.conf shared by the whole process
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = CanvasRegistry()
+        return _default_registry
+
+
+def get_canvas(section='Default'):
+    """
+    :param section: section of ~/.canvasctl/canvas.conf
+    :return:        cached Canvas client of the section
+    """
+    return get_registry().get(section)
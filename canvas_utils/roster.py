@@ -0,0 +1,59 @@
+import csv
+import json
+
+
+USER_FIELDS = ['id', 'sortable_name', 'name', 'login_id', 'email', 'sis_user_id', 'created_at']
+ENROLLMENT_FIELDS = ['user_id', 'user.sortable_name', 'user.login_id', 'type', 'enrollment_state', 'created_at',
+                     'last_activity_at']
+
+
+def project(record, fields):
+    """
+    Picks fields from a record. Nested values are addressed with dots, e.g. 'user.sortable_name'.
+
+    :param record: dict
+    :param fields: list of field names
+    :return:       dict field -> value (None if missing)
+    """
+    out = {}
+    for field in fields:
+        value = record
+        for part in field.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        out[field] = value
+    return out
+
+
+def write_records(records, dest, fmt='csv', fields=None):
+    """
+    Writes records incrementally as csv or jsonl
+
+    :param records: iterable of dict
+    :param dest:    file name (str) or text stream
+    :param fmt:     'csv' or 'jsonl'
+    :param fields:  list of fields to write (None: all fields of the first record)
+    :return:        no of records written
+    """
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError("fmt must be 'csv' or 'jsonl'")
+    if isinstance(dest, str):
+        with open(dest, 'w', newline='', encoding='utf-8') as f:
+            return write_records(records, f, fmt, fields)
+
+    n = 0
+    writer = None
+    for record in records:
+        if fields is None:
+            fields = list(record)
+        row = project(record, fields)
+        if fmt == 'jsonl':
+            dest.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            if writer is None:
+                writer = csv.DictWriter(dest, fieldnames=fields, extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+        n += 1
+    if writer is None and fmt == 'csv' and fields:
+        csv.DictWriter(dest, fieldnames=fields).writeheader()
+    return n
@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class TokenBucket(object):
+    """
+    Client side rate limiter. Up to burst requests may be sent at once, afterwards the requests are
+    spaced to rate requests per second. The rate is lowered when canvas reports a low remaining quota
+    (X-Rate-Limit-Remaining below low) and restored when the quota recovers.
+    """
+    def __init__(self, rate=20.0, burst=None, low=200.0):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self.low = low
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocks until one is available
+
+        :return: %
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def feed(self, remaining):
+        """
+        Adapts the rate to the remaining rate limit quota
+
+        :param remaining: value of the X-Rate-Limit-Remaining header (str, float or None)
+        :return:          %
+        """
+        try:
+            remaining = float(remaining)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self.rate = self.max_rate * max(0.05, min(1.0, remaining / self.low))
+
+
+class Transport(object):
+    """
+    Settings of the pooled, retrying HTTP transport. Pass an instance to Canvas(..., transport=...).
+
+    :param pool_size:   no of keep-alive connections per host, should be >= the no of concurrent workers
+    :param retries:     max. no of retries of a throttled or failed request
+    :param backoff:     base delay of the exponential backoff in seconds
+    :param max_backoff: max. delay between two retries in seconds
+    :param rate:        max. no of requests per second (None: no client side limit)
+    :param burst:       no of requests which may be sent at once (default: rate)
+    :param low:         X-Rate-Limit-Remaining below which the rate is lowered
+    """
+    def __init__(self, pool_size=16, retries=5, backoff=0.5, max_backoff=30.0, rate=20.0, burst=None, low=200.0):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate = rate
+        self.burst = burst
+        self.low = low
+
+    def session(self):
+        return TransportSession(self)
+
+
+class TransportSession(requests.Session):
+    """
+    requests session used by the canvasapi requester if a Transport is configured.
+
+    Throttled requests (403 'Rate Limit Exceeded', 429) are always retried. Server errors (5xx) and
+    connection errors are retried for idempotent methods; for POST and PATCH only 503, which means the
+    request was not processed. After a 502 or 504 canvas may well have created the object, so a retry
+    could create it twice. The delay is exponential with full jitter or the value of a Retry-After header.
+    """
+    def __init__(self, transport):
+        super(TransportSession, self).__init__()
+        self.transport = transport
+        self.bucket = TokenBucket(transport.rate, transport.burst, transport.low) if transport.rate else None
+        adapter = HTTPAdapter(pool_connections=transport.pool_size, pool_maxsize=transport.pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def _should_retry(self, method, response):
+        status = response.status_code
+        if status == 429 or (status == 403 and b'Rate Limit Exceeded' in response.content):
+            return True
+        if status == 503:
+            return True
+        return status >= 500 and method in IDEMPOTENT_METHODS
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            try:
+                return min(self.transport.max_backoff, float(response.headers['Retry-After']))
+            except (KeyError, ValueError):
+                pass
+        return random.uniform(0, min(self.transport.max_backoff, self.transport.backoff * 2 ** attempt))
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        files = kwargs.get('files')
+        files = files if isinstance(files, dict) else {}
+        positions = {}
+        for name, value in files.items():
+            fp = value[1] if isinstance(value, tuple) else value
+            if hasattr(fp, 'seek') and hasattr(fp, 'tell'):
+                positions[name] = (fp, fp.tell())
+
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self.bucket.acquire()
+            for fp, pos in positions.values():
+                fp.seek(pos)
+            try:
+                response = super(TransportSession, self).request(method, url, *args, **kwargs)
+            except requests.ConnectionError:
+                if method not in IDEMPOTENT_METHODS or attempt >= self.transport.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+                continue
+
+            if self.bucket is not None:
+                self.bucket.feed(response.headers.get('X-Rate-Limit-Remaining'))
+            if attempt >= self.transport.retries or not self._should_retry(method, response):
+                return response
+            response.close()
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
@@ -0,0 +1,103 @@
+def _sample(rng, dist, n):
+    import numpy as np
+
+    if callable(dist):
+        return np.asarray(dist(rng, n))
+    if isinstance(dist, tuple) and dist and isinstance(dist[0], str):
+        kind, args = dist[0], dist[1:]
+        if kind == 'uniform':
+            values = rng.uniform(args[0], args[1], n)
+        elif kind == 'normal':
+            values = rng.normal(args[0], args[1], n)
+        elif kind == 'randint':
+            return rng.integers(args[0], args[1] + 1, n)
+        elif kind == 'choice':
+            return rng.choice(np.asarray(args[0]), n)
+        else:
+            raise ValueError('Unknown distribution %r' % kind)
+        if len(args) > 2:
+            values = np.round(values, args[2])
+        return values
+    if isinstance(dist, (list, tuple)):
+        return rng.choice(np.asarray(dist), n)
+    return np.full(n, dist)
+
+
+def _per_variant(value, answers, params):
+    import numpy as np
+
+    if value is None:
+        return None
+    if callable(value):
+        value = value(answers, **params)
+    return np.broadcast_to(np.asarray(value, dtype=float), answers.shape)
+
+
+def _scalar(x):
+    return x.item() if hasattr(x, 'item') else x
+
+
+def numerical_variants(title, text, params, answer, n, precision=None, errorMargin=None, seed=None, unique=True,
+                       max_rounds=10):
+    """
+    Generates randomized variants of a numerical question in one vectorized NumPy pass.
+
+    The texts are templates for str.format: parameters are inserted by name ({m}, {v:.1f}), {i} is the
+    no of the variant. Parameter distributions are given as
+      ('uniform', low, high[, decimals]), ('normal', mean, std[, decimals]), ('randint', low, high),
+      ('choice', values), a list of values, a constant or a callable (rng, n) -> array.
+
+        specs = numerical_variants('Energy {i}', 'm = {m} kg, v = {v} m/s. E in J?',
+                                   dict(m=('randint', 1, 10), v=('uniform', 1, 5, 1)),
+                                   lambda m, v: 0.5*m*v**2, n=50, errorMargin=lambda E, **p: 0.01*E)
+
+    :param title:       title template (str)
+    :param text:        question text template (str)
+    :param params:      dict name -> distribution
+    :param answer:      vectorized function of the parameters (keyword arguments) returning the answers
+    :param n:           no of variants
+    :param precision:   precision of the answers: number, array or function (answers, **params) -> array
+    :param errorMargin: error margin of the answers: number, array or function (answers, **params) -> array
+    :param seed:        seed of the random generator
+    :param unique:      drop variants with identical parameters, more variants are drawn to reach n
+    :param max_rounds:  max. no of draws used to reach n unique variants (ValueError if they do not suffice)
+    :return:            list of question specs for CanvasQuiz.bulk_add_questions (type 'numerical')
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('Question variants require NumPy (pip install numpy)')
+
+    if precision is None and errorMargin is None:
+        errorMargin = 0.0
+    rng = np.random.default_rng(seed)
+    specs = []
+    seen = set()
+    for _ in range(max_rounds):
+        missing = n - len(specs)
+        if missing <= 0:
+            break
+        values = {name: _sample(rng, dist, missing) for name, dist in params.items()}
+        answers = np.asarray(answer(**values), dtype=float)
+        answers = np.broadcast_to(answers, (missing,))
+        precisions = _per_variant(precision, answers, values)
+        margins = _per_variant(errorMargin, answers, values)
+
+        for k in range(missing):
+            row = {name: _scalar(v[k]) for name, v in values.items()}
+            if unique:
+                key = tuple(sorted(row.items()))
+                if key in seen:
+                    continue
+                seen.add(key)
+            spec = dict(type='numerical', title=title.format(i=len(specs) + 1, **row),
+                        text=text.format(i=len(specs) + 1, **row), answer=float(answers[k]))
+            if precisions is not None:
+                spec['precision'] = int(precisions[k])
+            else:
+                spec['errorMargin'] = float(margins[k])
+            specs.append(spec)
+    if len(specs) < n:
+        raise ValueError('Only %d unique variants found for n=%d in %d draws; widen the parameter '
+                         'distributions or use unique=False' % (len(specs), n, max_rounds))
+    return specs[:n]
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='canvas_utils',
@@ -10,5 +10,13 @@ setup(
     url='https://github.com/UKlauck/canvas_utils',
     keywords=['canvas', 'lms'],
     classifiers=[],
-    scripts=[],
+    install_requires=['canvasapi', 'requests'],
+    extras_require={
+        'images': ['Pillow'],
+        'numpy': ['numpy'],
+        'yaml': ['pyyaml'],
+    },
+    entry_points={
+        'console_scripts': ['canvasctl = canvas_utils.cli:main'],
+    },
 )
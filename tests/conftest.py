@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+from canvas_utils import Canvas  # noqa: E402
+from fake_canvas import FakeCanvas  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """
+    In-process fake canvas server without latency (see benchmarks/fake_canvas.py)
+    """
+    fake = FakeCanvas(latency=0.0).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def course(server):
+    return Canvas(server.url, 'token').get_course(server.add_course('Test'))
+
+
+def requests(server, method, endpoint):
+    """
+    :return: no of requests to an endpoint since the last reset, e.g. ('POST', 'quizzes/:id/questions')
+    """
+    return sum(n for key, n in server.counts.items() if key == '%s /api/v1/courses/:id/%s' % (method, endpoint))
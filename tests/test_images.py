@@ -0,0 +1,42 @@
+"""
+Downscaling and recompression of images before the upload
+"""
+import io
+
+import pytest
+
+from canvas_utils.images import fit_image
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def encode(size, fmt, mode='RGB', **kwargs):
+    img = Image.linear_gradient('L').resize(size).convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def test_small_jpeg_is_kept_with_max_size():
+    data = encode((200, 100), 'JPEG', quality=90)
+    assert fit_image('photo.jpg', data, max_size=400) == ('photo.jpg', data)
+
+
+def test_large_jpeg_stays_jpeg_with_max_size():
+    data = encode((1600, 800), 'JPEG', quality=90)
+    name, fitted = fit_image('photo.jpg', data, max_size=400)
+    assert name == 'photo.jpg' and len(fitted) < len(data)
+    img = Image.open(io.BytesIO(fitted))
+    assert img.format == 'JPEG' and img.size == (400, 200)
+
+
+def test_byte_budget():
+    data = encode((1600, 800), 'PNG')
+    _, fitted = fit_image('plot.png', data, max_bytes=len(data) // 4)
+    assert len(fitted) <= len(data) // 4
+
+
+def test_transparent_png_stays_png():
+    data = encode((1600, 800), 'PNG', mode='RGBA')
+    name, fitted = fit_image('plot.png', data, max_size=400)
+    assert name == 'plot.png' and Image.open(io.BytesIO(fitted)).size == (400, 200)
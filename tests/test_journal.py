@@ -0,0 +1,90 @@
+"""
+Interrupted and resumed quiz builds (CanvasCourse.create_quiz(..., journal=...)) against the fake server
+"""
+import pytest
+from canvasapi.util import combine_kwargs
+
+from conftest import requests
+
+
+class Interrupted(Exception):
+    pass
+
+
+def build(course, journal, n=10, interrupt_at=None, changed=()):
+    quiz = course.create_quiz('Exam', journal=journal)
+    quiz.new_quiz_group('Pool', 2, 1)
+    with quiz.batch() as batch:
+        for i in range(n):
+            if i == interrupt_at:
+                batch.flush()
+                raise Interrupted()
+            text = 'text %d%s' % (i, ' (changed)' if i in changed else '')
+            quiz.new_mc_question('Q%d' % i, text, 'a', ['b', 'c'], grouped=True)
+    return quiz
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'build.jsonl')
+
+
+def test_resume_skips_recorded_questions(server, course, journal):
+    with pytest.raises(Interrupted):
+        build(course, journal, interrupt_at=6)
+    assert len(server.courses[course.id]['questions']) == 6
+
+    server.reset_counts()
+    quiz = build(course, journal)
+    assert requests(server, 'POST', 'quizzes') == 0
+    assert requests(server, 'POST', 'quizzes/:id/groups') == 0
+    assert requests(server, 'POST', 'quizzes/:id/questions') == 4
+    assert requests(server, 'PUT', 'quizzes/:id/questions/:id') == 0
+
+    questions = server.courses[course.id]['questions'].values()
+    assert len(server.courses[course.id]['quizzes']) == 1
+    assert sorted(q['position'] for q in questions) == list(range(1, 11))
+    assert [q.key for q in quiz.questions] == ['Q%d' % i for i in range(10)]
+
+
+def test_changed_question_is_updated(server, course, journal):
+    build(course, journal)
+    server.reset_counts()
+    build(course, journal, changed=[3])
+    assert requests(server, 'POST', 'quizzes/:id/questions') == 0
+    assert requests(server, 'PUT', 'quizzes/:id/questions/:id') == 1
+
+    texts = sorted(q['question_text'] for q in server.courses[course.id]['questions'].values())
+    assert len(texts) == 10 and 'text 3 (changed)' in texts
+
+
+def test_deleted_group_is_created_again(server, course, journal):
+    with pytest.raises(Interrupted):
+        build(course, journal, interrupt_at=6)
+    quiz_id = next(iter(server.courses[course.id]['quizzes']))
+    group_id = next(iter(server.courses[course.id]['groups']))
+    course._requester.request('DELETE', 'courses/{}/quizzes/{}/groups/{}'.format(course.id, quiz_id, group_id))
+
+    server.reset_counts()
+    build(course, journal)
+    assert requests(server, 'POST', 'quizzes/:id/groups') == 1
+    # the recorded questions point to the deleted group and are moved to the new one
+    assert requests(server, 'PUT', 'quizzes/:id/questions/:id') == 6
+    assert requests(server, 'POST', 'quizzes/:id/questions') == 4
+
+    groups = server.courses[course.id]['groups']
+    assert list(groups) != [group_id] and len(groups) == 1
+    assert set(q['quiz_group_id'] for q in server.courses[course.id]['questions'].values()) == set(groups)
+
+
+def test_resume_into_quiz_with_other_questions(server, course, journal):
+    with pytest.raises(Interrupted):
+        build(course, journal, interrupt_at=6)
+    quiz_id = next(iter(server.courses[course.id]['quizzes']))
+    course._requester.request('POST', 'courses/{}/quizzes/{}/questions'.format(course.id, quiz_id),
+                              _kwargs=combine_kwargs(question=dict(question_name='Intro', position=1,
+                                                                   question_type='text_only_question')))
+
+    quiz = build(course, journal)
+    assert quiz.question_offset == 1
+    assert [q.position for q in quiz.questions] == list(range(2, 12))
@@ -0,0 +1,28 @@
+"""
+CourseMirror against the fake server
+"""
+from canvasapi.util import combine_kwargs
+
+
+def image(course, file_id):
+    return '<img src="/courses/%d/files/%d/preview">' % (course.id, file_id)
+
+
+def test_edited_question_is_synced(server, course, tmp_path):
+    files = server.add_objects(course.id, 'files', 3, updated_at='2024-01-01T00:00:00Z', folder_id=None)
+    quiz = course.create_quiz('Exam')
+    quiz.new_essay_question('Q1', 'first ' + image(course, files[0]))
+    question_id = quiz.questions[0].id
+
+    mirror = course.mirror(str(tmp_path / 'mirror.sqlite'))
+    assert [r['quiz_id'] for r in mirror.quizzes_using_file(files[0])] == [quiz.id]
+    assert len(mirror.orphaned_files()) == 2
+
+    # the quiz listing does not change when a question is edited
+    course._requester.request('PUT', 'courses/{}/quizzes/{}/questions/{}'.format(course.id, quiz.id, question_id),
+                              _kwargs=combine_kwargs(question=dict(question_text='second ' + image(course, files[1]))))
+    mirror.sync()
+    assert not mirror.quizzes_using_file(files[0])
+    assert [r['quiz_id'] for r in mirror.quizzes_using_file(files[1])] == [quiz.id]
+    assert [r['id'] for r in mirror.find_questions('second')] == [question_id]
+    mirror.close()
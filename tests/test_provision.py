@@ -0,0 +1,59 @@
+"""
+CanvasCourse.provision and create_folders against the fake server
+"""
+from canvas_utils.images import upload_bytes
+
+from conftest import requests
+
+LAYOUT = dict(folders=['Images', 'Lectures/Week 1', {'Exams': {'2024': {}, '2025': {}}}],
+              modules=[dict(name='Week %d' % i, items=[dict(title='Notes', type='SubHeader')]) for i in range(3)])
+
+
+def folder_names(server, course):
+    return sorted(f['full_name'] for f in server.courses[course.id]['folders'].values())
+
+
+def test_provision_again_creates_nothing(server, course):
+    summary = course.provision(LAYOUT)
+    assert len(summary.created) == 12 and not summary.existing and not summary.failed
+    assert folder_names(server, course) == ['course files', 'course files/Exams', 'course files/Exams/2024',
+                                            'course files/Exams/2025', 'course files/Images',
+                                            'course files/Lectures', 'course files/Lectures/Week 1']
+
+    server.reset_counts()
+    summary = course.provision(LAYOUT)
+    assert not summary.created and len(summary.existing) == 12
+    assert not [key for key in server.counts if not key.startswith('GET ')]
+    # the folder index of the first run is reused
+    assert requests(server, 'GET', 'folders') == 0
+
+
+def test_create_after_delete(server, course):
+    assert len(course.create_folders(['A', 'B']).created) == 2
+    course.delete_folders()
+    summary = course.create_folders(['A', 'B'])
+    assert len(summary.created) == 2 and not summary.existing
+    assert folder_names(server, course) == ['course files', 'course files/A', 'course files/B']
+
+
+def test_folder_created_by_upload(server, course):
+    course.create_folders('A')
+    upload_bytes(course, 'x.png', b'\x89PNG\r\n\x1a\n', parent_folder_path='/Images')
+
+    summary = course.create_folders('Images/Icons')
+    assert summary.existing == ['folder:Images'] and summary.created == ['folder:Images/Icons']
+    assert folder_names(server, course).count('course files/Images') == 1
+
+
+def test_failed_item_listing_is_reported(server, course, monkeypatch):
+    course.provision(dict(modules=LAYOUT['modules']))
+    route = server.route
+
+    def failing(method, path, pairs, upload):
+        if method == 'GET' and path.endswith('/items'):
+            return 500, {'errors': [{'message': 'internal error'}]}, {}
+        return route(method, path, pairs, upload)
+
+    monkeypatch.setattr(server, 'route', failing)
+    summary = course.provision(dict(modules=LAYOUT['modules']))
+    assert sorted(summary.failed) == ['items:Week %d' % i for i in range(3)]
@@ -0,0 +1,33 @@
+"""
+CanvasQuiz.bulk_add_questions and its async variant against the fake server
+"""
+import asyncio
+
+from canvas_utils.aio import AsyncCanvas
+
+
+def make_specs(missing):
+    specs = [dict(type='essay', title='Q%d' % i, text='text %d' % i) for i in range(6)]
+    specs[2]['image'] = missing
+    return specs
+
+
+def test_failed_build_does_not_drop_the_batch(server, course, tmp_path):
+    quiz = course.create_quiz('Exam')
+    failures = quiz.bulk_add_questions(make_specs(str(tmp_path / 'missing.png')))
+
+    assert [(i, type(e)) for i, _, e in failures] == [(2, FileNotFoundError)]
+    assert [q.key for q in quiz.questions] == ['Q0', 'Q1', 'Q3', 'Q4', 'Q5']
+    assert len(server.courses[course.id]['questions']) == 5
+
+
+def test_failed_build_does_not_drop_the_async_batch(server, course, tmp_path):
+    async def build():
+        async with AsyncCanvas(server.url, 'token') as canvas:
+            quiz = await (await canvas.get_course(course.id)).create_quiz('Exam')
+            return quiz, await quiz.bulk_add_questions(make_specs(str(tmp_path / 'missing.png')))
+
+    quiz, failures = asyncio.run(build())
+    assert [(i, type(e)) for i, _, e in failures] == [(2, FileNotFoundError)]
+    assert len(quiz.quiz.questions) == 5
+    assert len(server.courses[course.id]['questions']) == 5
@@ -0,0 +1,81 @@
+"""
+CanvasQuiz.sync against the fake server
+"""
+import os
+
+import pytest
+
+from conftest import requests
+
+
+def make_spec(n=6):
+    return dict(quiz=dict(title='Exam'),
+                groups=[dict(key='pool', name='Pool', pick_count=1, points=2)],
+                questions=[dict(key='k%d' % i, type='essay', title='Q%d' % i, text='text %d' % i,
+                                group='pool' if i < 2 else None) for i in range(n)])
+
+
+def titles(server, course):
+    questions = sorted(server.courses[course.id]['questions'].values(), key=lambda q: q['position'])
+    return [q['question_name'] for q in questions]
+
+
+@pytest.fixture
+def quiz(course):
+    return course.create_quiz('Draft')
+
+
+@pytest.fixture
+def state(tmp_path):
+    return str(tmp_path / 'state.json')
+
+
+def test_unchanged_spec_sends_nothing(server, course, quiz, state):
+    spec = make_spec()
+    summary = quiz.sync(spec, state_file=state)
+    assert len(summary.created) == 6 and quiz.title == 'Exam'
+    assert titles(server, course) == ['Q%d' % i for i in range(6)]
+
+    server.reset_counts()
+    summary = quiz.sync(spec, state_file=state)
+    assert len(summary.unchanged) == 6
+    assert not [key for key in server.counts if not key.startswith('GET ')]
+
+
+def test_lost_state_matches_remote_groups(server, course, quiz, state):
+    spec = make_spec()
+    quiz.sync(spec, state_file=state)
+    os.remove(state)
+
+    summary = quiz.sync(spec, state_file=state)
+    assert not summary.created and not summary.failed
+    assert len(server.courses[course.id]['groups']) == 1
+    assert len(server.courses[course.id]['questions']) == 6
+
+
+def test_insert_creates_one_question_and_reorders(server, course, quiz, state):
+    spec = make_spec()
+    quiz.sync(spec, state_file=state)
+    spec['questions'].insert(0, dict(key='new', type='essay', title='New', text='new'))
+
+    server.reset_counts()
+    summary = quiz.sync(spec, state_file=state)
+    assert summary.created == ['new'] and len(summary.unchanged) == 6
+    assert requests(server, 'POST', 'quizzes/:id/questions') == 1
+    assert requests(server, 'PUT', 'quizzes/:id/questions/:id') == 0
+    assert requests(server, 'POST', 'quizzes/:id/reorder') == 1
+    assert titles(server, course) == ['New'] + ['Q%d' % i for i in range(6)]
+
+
+def test_changed_and_removed_questions(server, course, quiz, state):
+    spec = make_spec()
+    quiz.sync(spec, state_file=state)
+    spec['questions'][3]['text'] = 'changed'
+    del spec['questions'][5]
+
+    server.reset_counts()
+    summary = quiz.sync(spec, state_file=state)
+    assert summary.updated == ['k3'] and summary.deleted == ['k5']
+    assert requests(server, 'PUT', 'quizzes/:id/questions/:id') == 1
+    assert requests(server, 'POST', 'quizzes/:id/reorder') == 0
+    assert titles(server, course) == ['Q%d' % i for i in range(5)]
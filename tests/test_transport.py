@@ -0,0 +1,35 @@
+"""
+Retry policy of the pooled transport
+"""
+import pytest
+import requests
+
+from canvas_utils.transport import Transport
+
+
+def response(status, content=b''):
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    return r
+
+
+@pytest.mark.parametrize('method,status,retry', [
+    ('POST', 429, True),
+    ('POST', 403, False),
+    ('POST', 503, True),
+    ('POST', 502, False),
+    ('POST', 504, False),
+    ('PATCH', 504, False),
+    ('POST', 500, False),
+    ('GET', 502, True),
+    ('PUT', 504, True),
+    ('DELETE', 500, True),
+])
+def test_should_retry(method, status, retry):
+    assert Transport().session()._should_retry(method, response(status)) == retry
+
+
+def test_throttled_post_is_retried():
+    session = Transport().session()
+    assert session._should_retry('POST', response(403, b'403 Forbidden (Rate Limit Exceeded)'))